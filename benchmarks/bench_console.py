@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+"""Measure console commands per second.
+
+"parse" compares console.parse() with the shlex-based parser it
+replaced, on the argument string of a typical update. "onecmd" runs
+whole commands through HBNBCommand.onecmd(), output discarded.
+
+Usage: ./benchmarks/bench_console.py [N]
+"""
+import io
+import os
+import re
+import shlex
+import sys
+import tempfile
+import timeit
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.chdir(tempfile.mkdtemp())
+
+from console import HBNBCommand, parse  # noqa: E402
+from models.user import User  # noqa: E402
+
+
+def shlex_parse(arg):
+    """The parser console.py used before the precompiled tokenizer."""
+    curly_braces = re.search(r"\{(.*?)\}", arg)
+    brackets = re.search(r"\[(.*?)\]", arg)
+    if curly_braces is None:
+        if brackets is None:
+            return [i.strip(",") for i in shlex.split(arg)]
+        lexer = shlex.split(arg[:brackets.span()[0]])
+        retl = [i.strip(",") for i in lexer]
+        retl.append(brackets.group())
+        return retl
+    lexer = shlex.split(arg[:curly_braces.span()[0]])
+    retl = [i.strip(",") for i in lexer]
+    retl.append(curly_braces.group())
+    return retl
+
+
+def rate(function, count):
+    """Return how many times per second function() runs."""
+    return count / timeit.timeit(function, number=count)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    user = User()
+    arg = 'User {} first_name "John Paul"'.format(user.id)
+    console = HBNBCommand()
+    sink = io.StringIO()
+    print("{:>24}{:>14}".format("case", "per second"))
+    for name, function in [
+            ("parse (shlex)", lambda: shlex_parse(arg)),
+            ("parse", lambda: parse(arg)),
+            ("show", lambda: console.onecmd("show " + arg)),
+            ("User.show(id)",
+             lambda: console.onecmd('User.show("{}")'.format(user.id)))]:
+        with redirect_stdout(sink):
+            result = rate(function, count)
+        sink.seek(0)
+        sink.truncate()
+        print("{:>24}{:>14.0f}".format(name, result))
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+"""Compare radius queries through the grid index with a full scan.
+
+Places are spread over the continental United States; each query asks
+for the places within RADIUS km of a random point. The index is fed
+compact records (models.compact) so that a million places fit in
+memory.
+
+Usage: ./benchmarks/bench_geo.py [N ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.chdir(tempfile.mkdtemp())
+
+from models.compact import compact_class  # noqa: E402
+from models.engine.indexes import GridIndex, distance  # noqa: E402
+from models.place import Place  # noqa: E402
+
+RADIUS = 10
+QUERIES = 100
+
+
+def point():
+    """Return a random (latitude, longitude) point."""
+    return random.uniform(25, 49), random.uniform(-124, -67)
+
+
+def bench(count):
+    """Return the measures of one size, as a dict."""
+    record = compact_class(Place)
+    places = {}
+    for _ in range(count):
+        lat, lon = point()
+        obj = record(id=str(uuid.uuid4()), latitude=lat, longitude=lon)
+        places["Place." + obj.id] = obj
+    index = GridIndex()
+    start = time.perf_counter()
+    for key, obj in places.items():
+        index.add(key, obj)
+    build = time.perf_counter() - start
+    centers = [point() for _ in range(QUERIES)]
+    start = time.perf_counter()
+    for lat, lon in centers:
+        index.near(lat, lon, RADIUS)
+    indexed = (time.perf_counter() - start) / QUERIES
+    start = time.perf_counter()
+    for lat, lon in centers[:3]:
+        found = ((distance(lat, lon, obj.latitude, obj.longitude), key)
+                 for key, obj in places.items())
+        sorted(item for item in found if item[0] <= RADIUS)
+    scan = (time.perf_counter() - start) / 3
+    return {"build_s": build, "near_ms": indexed * 1000,
+            "scan_ms": scan * 1000}
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100000, 1000000]
+    columns = ["build_s", "near_ms", "scan_ms"]
+    print("{:>9}".format("places") +
+          "".join("{:>11}".format(c) for c in columns))
+    for count in sizes:
+        result = bench(count)
+        print("{:>9}".format(count) +
+              "".join("{:>11.2f}".format(result[c]) for c in columns))
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+"""Compare the ways of building model instances from dictionaries.
+
+For each size the script reports the instances built per second from
+to_dict() dictionaries by cls(**value) ("kwargs"), by cls.from_dict()
+("from_dict") and by cls.from_dicts() ("from_dicts"), and the time of
+a full FileStorage.reload() of a JSON snapshot of them ("reload").
+
+Usage: ./benchmarks/bench_hydrate.py [N ...]
+"""
+from datetime import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.chdir(tempfile.mkdtemp())
+
+from models.engine import snapshot  # noqa: E402
+from models.engine.file_storage import FileStorage  # noqa: E402
+from models.place import Place  # noqa: E402
+
+
+def places(count):
+    """Return count to_dict() dictionaries of Place objects."""
+    now = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%f")
+    return [{"id": str(uuid.uuid4()), "created_at": now, "updated_at": now,
+             "name": "Place {}".format(i), "city_id": str(uuid.uuid4()),
+             "max_guest": i % 8, "price_by_night": i % 500,
+             "latitude": 37.7 + i * 1e-6, "longitude": -122.4 - i * 1e-6,
+             "__class__": "Place"} for i in range(count)]
+
+
+def timed(function):
+    """Return the seconds taken by function()."""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def bench(count):
+    """Return the measures of one size, as a dict."""
+    values = places(count)
+    with open("file.json", "w") as f:
+        snapshot.dump(f, (("Place." + v["id"], json.dumps(v))
+                          for v in values))
+    return {
+        "kwargs": count / timed(lambda: [Place(**v) for v in values]),
+        "from_dict": count / timed(
+            lambda: [Place.from_dict(v) for v in values]),
+        "from_dicts": count / timed(lambda: Place.from_dicts(values)),
+        "reload": timed(FileStorage("file.json", indexes={}).reload),
+    }
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100000, 1000000]
+    columns = ["kwargs", "from_dict", "from_dicts", "reload"]
+    print("{:>9}".format("objects") +
+          "".join("{:>13}".format(c) for c in columns))
+    for count in sizes:
+        result = bench(count)
+        print("{:>9}".format(count) +
+              "".join("{:>13.0f}".format(result[c]) for c in columns[:3]) +
+              "{:>13.2f}".format(result["reload"]))
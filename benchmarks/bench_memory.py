@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+"""Compare the memory held by model instances and compact records.
+
+For each model class the script builds N objects with every declared
+attribute set, as a loaded dataset would, and reports the bytes
+allocated per object for regular instances and for the records of
+models.compact. Strings shared with the source dictionaries, such as
+the ids kept by regular instances, are not counted.
+
+Usage: ./benchmarks/bench_memory.py [N]
+"""
+from datetime import datetime
+import os
+import sys
+import tempfile
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.chdir(tempfile.mkdtemp())
+
+from models.compact import compact_class  # noqa: E402
+from models.engine.file_storage import FileStorage  # noqa: E402
+
+
+def values(model, count):
+    """Yield count to_dict() dictionaries of model objects."""
+    fields = compact_class(model).fields
+    for i in range(count):
+        now = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%f")
+        value = {"id": str(uuid.uuid4()), "created_at": now,
+                 "updated_at": now, "__class__": model.__name__}
+        for name in fields:
+            default = getattr(model, name)
+            if isinstance(default, str):
+                value[name] = "{} {}".format(name, i)
+            elif isinstance(default, list):
+                value[name] = []
+            else:
+                value[name] = type(default)(i % 100)
+        yield value
+
+
+def measure(build, dataset):
+    """Return the bytes allocated per object by build(value)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [build(value) for value in dataset]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    return size / len(dataset)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print("{:>10}{:>12}{:>12}{:>8}".format("class", "model_b", "compact_b",
+                                           "ratio"))
+    for name, model in FileStorage.classes().items():
+        dataset = list(values(model, count))
+        full = measure(lambda value: model(**value), dataset)
+        record = compact_class(model)
+        small = measure(lambda value: record(**value), dataset)
+        print("{:>10}{:>12.0f}{:>12.0f}{:>8.2f}".format(
+            name, full, small, full / small))
@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+"""Measure the cost of place.save() after one change, next to N
+untouched places.
+
+The write-behind column is the time save() keeps the caller waiting
+when a background thread writes the snapshot every second.
+
+Usage: ./benchmarks/bench_save.py [N ...]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.chdir(tempfile.mkdtemp())
+
+import models.base_model  # noqa: E402
+from models.engine.file_storage import FileStorage  # noqa: E402
+from models.place import Place  # noqa: E402
+
+
+def bench(count, journal, repeat=20, write_behind=None):
+    """Return the mean seconds of one place.save() after a change."""
+    fs = FileStorage("bench-{}-{}-{}.json".format(count, journal,
+                                                  write_behind),
+                     journal=journal, compact_threshold=10 ** 9,
+                     write_behind=write_behind)
+    models.base_model.storage = fs
+    for i in range(count):
+        pl = Place()
+        pl.city_id = str(i % 100)
+        pl.price_by_night = i % 300
+    pl = Place()
+    fs.flush()
+
+    def change_and_save():
+        pl.name = "Loft"
+        pl.save()
+    return timeit.timeit(change_and_save, number=repeat) / repeat
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 100000]
+    print("{:>10} {:>14} {:>14} {:>19}".format(
+        "objects", "snapshot (ms)", "journal (ms)", "write-behind (ms)"))
+    for count in sizes:
+        print("{:>10} {:>14.3f} {:>14.3f} {:>19.3f}".format(
+            count, bench(count, False) * 1000, bench(count, True) * 1000,
+            bench(count, False, write_behind=1) * 1000))
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+"""Compare full-text search through TextIndex with a substring scan.
+
+Each review is 30 words drawn from a Zipf-like vocabulary of 20000
+words; queries are two words of mid frequency. The index is fed
+compact records (models.compact) so that a million reviews fit in
+memory.
+
+Usage: ./benchmarks/bench_search.py [N ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.chdir(tempfile.mkdtemp())
+
+from models.compact import compact_class  # noqa: E402
+from models.engine.indexes import TextIndex  # noqa: E402
+from models.review import Review  # noqa: E402
+
+VOCABULARY = ["w{}".format(i) for i in range(20000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+QUERIES = 50
+
+
+def bench(count):
+    """Return the measures of one size, as a dict."""
+    random.seed(count)
+    record = compact_class(Review)
+    reviews = {}
+    for _ in range(count):
+        text = " ".join(random.choices(VOCABULARY, WEIGHTS, k=30))
+        obj = record(id=str(uuid.uuid4()), text=text)
+        reviews["Review." + obj.id] = obj
+    index = TextIndex(("text",))
+    start = time.perf_counter()
+    for key, obj in reviews.items():
+        index.add(key, obj)
+    build = time.perf_counter() - start
+    queries = [" ".join(random.sample(VOCABULARY[100:2000], 2))
+               for _ in range(QUERIES)]
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query)
+    search = (time.perf_counter() - start) / QUERIES
+    start = time.perf_counter()
+    for query in queries[:3]:
+        words = [" " + word + " " for word in query.split()]
+        [key for key, obj in reviews.items()
+         if any(word in " " + obj.text + " " for word in words)]
+    scan = (time.perf_counter() - start) / 3
+    return {"build_s": build, "search_ms": search * 1000,
+            "scan_ms": scan * 1000}
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100000, 1000000]
+    columns = ["build_s", "search_ms", "scan_ms"]
+    print("{:>9}".format("reviews") +
+          "".join("{:>11}".format(c) for c in columns))
+    for count in sizes:
+        result = bench(count)
+        print("{:>9}".format(count) +
+              "".join("{:>11.2f}".format(result[c]) for c in columns))
@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+"""Compare the size and load time of JSON and binary snapshots.
+
+For each size the script reports the file sizes, the time to decode
+the file into to_dict() dictionaries ("decode") and the time of a full
+FileStorage.reload() building the model instances ("reload").
+
+Usage: ./benchmarks/bench_snapshot.py [N ...]
+"""
+from datetime import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.chdir(tempfile.mkdtemp())
+
+from models.engine import binary, snapshot  # noqa: E402
+from models.engine.file_storage import FileStorage  # noqa: E402
+
+
+def places(count):
+    """Yield count to_dict() dictionaries of Place objects."""
+    for i in range(count):
+        now = datetime.now().isoformat()
+        yield {"id": str(uuid.uuid4()), "created_at": now,
+               "updated_at": now, "name": "Place {}".format(i),
+               "city_id": str(uuid.uuid4()), "max_guest": i % 8,
+               "price_by_night": i % 500, "latitude": 37.7 + i * 1e-6,
+               "longitude": -122.4 - i * 1e-6, "__class__": "Place"}
+
+
+def timed(function):
+    """Return the seconds taken by function()."""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def decode_json(path):
+    with open(path, "r") as f:
+        json.load(f)
+
+
+def decode_binary(path):
+    with open(path, "rb") as f:
+        f.seek(len(binary.MAGIC))
+        for record in binary.load(f):
+            binary.decode(record)
+
+
+def bench(count):
+    """Return the measures of one size, as a dict."""
+    values = list(places(count))
+    with open("file.json", "w") as f:
+        snapshot.dump(f, (("Place." + v["id"], json.dumps(v))
+                          for v in values))
+    with open("file.bin", "wb") as f:
+        binary.dump(f, (binary.encode(v) for v in values))
+    del values
+    return {
+        "json_mb": os.path.getsize("file.json") / 1e6,
+        "bin_mb": os.path.getsize("file.bin") / 1e6,
+        "json_decode": timed(lambda: decode_json("file.json")),
+        "bin_decode": timed(lambda: decode_binary("file.bin")),
+        "json_reload": timed(FileStorage("file.json", indexes={}).reload),
+        "bin_reload": timed(FileStorage("file.bin", indexes={}).reload),
+    }
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100000, 1000000]
+    columns = ["json_mb", "bin_mb", "json_decode", "bin_decode",
+               "json_reload", "bin_reload"]
+    print("{:>9}".format("objects") +
+          "".join("{:>13}".format(c) for c in columns))
+    for count in sizes:
+        result = bench(count)
+        print("{:>9}".format(count) +
+              "".join("{:>13.2f}".format(result[c]) for c in columns))
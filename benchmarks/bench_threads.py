@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+"""Measure a thread-safe FileStorage shared by readers and a writer.
+
+A store of N places is shared by one writer thread, changing a place
+and saving in a loop, and R reader threads calling get() and near().
+For each number of readers the script reports the reads per second of
+all readers together, the longest single read ("max_read_ms") and the
+saves per second of the writer, first with save() holding the lock of
+the store for the whole write ("locked"), then as FileStorage does it,
+writing the file after releasing the lock ("cow").
+
+Usage: ./benchmarks/bench_threads.py [N [SECONDS]]
+"""
+from datetime import datetime
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.chdir(tempfile.mkdtemp())
+
+from models.engine.file_storage import FileStorage  # noqa: E402
+from models.place import Place  # noqa: E402
+import models.base_model  # noqa: E402
+
+
+def build(count):
+    """Return a saved thread-safe store of count places."""
+    fs = FileStorage("file.json", threadsafe=True)
+    now = datetime.now()
+    for i in range(count):
+        fs.new(Place.from_dict({
+            "id": str(uuid.uuid4()), "created_at": now, "updated_at": now,
+            "name": "Place {}".format(i), "latitude": random.uniform(37, 38),
+            "longitude": random.uniform(-123, -122)}))
+    fs.save()
+    return fs
+
+
+def bench(fs, readers, seconds, locked):
+    """Return (reads/s, longest read in ms, saves/s)."""
+    ids = [obj.id for obj in fs.all(Place).values()]
+    stop = threading.Event()
+    reads = []
+    slowest = []
+    saves = []
+
+    def read():
+        count = 0
+        worst = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            fs.get(Place, random.choice(ids))
+            fs.near(Place, 37.5, -122.5, 0.5)
+            worst = max(worst, time.perf_counter() - start)
+            count += 1
+        reads.append(count)
+        slowest.append(worst)
+
+    def write():
+        count = 0
+        while not stop.is_set():
+            fs.get(Place, random.choice(ids)).max_guest = count
+            if locked:
+                with fs.lock:
+                    fs.save()
+            else:
+                fs.save()
+            count += 1
+        saves.append(count)
+
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return (sum(reads) / seconds, max(slowest) * 1000,
+            sum(saves) / seconds)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    fs = build(count)
+    models.base_model.storage = fs
+    print("{:>8}{:>8}{:>12}{:>13}{:>9}".format(
+        "readers", "mode", "reads/s", "max_read_ms", "saves/s"))
+    for readers in (1, 2, 4, 8):
+        for mode in ("locked", "cow"):
+            result = bench(fs, readers, seconds, mode == "locked")
+            print("{:>8}{:>8}{:>12.0f}{:>13.1f}{:>9.1f}".format(
+                readers, mode, *result))
@@ -1,59 +1,222 @@
 #!/usr/bin/python3
+from ast import literal_eval
 import cmd
+from contextlib import redirect_stdout
+from datetime import datetime
+from itertools import islice
 import json
-import shlex
 from models import storage
 from models.base_model import BaseModel
-from shlex import split
+from models.user import User
+from models.state import State
+from models.city import City
+from models.place import Place
+from models.amenity import Amenity
+from models.review import Review
 import re
+import sys
+import time
 
-from models.engine.file_storage import FileStorage
+_TOKEN = re.compile(r"""
+    (\{[^}]*\}|\[[^\]]*\])          # a {...} or [...] group, kept whole
+    | "((?:[^"\\]|\\.)*)"           # a double-quoted string
+    | '([^']*)'                     # a single-quoted string
+    | ((?:[^\s,]|,(?=[^\s,]))+)      # a word, without edge commas
+    """, re.VERBOSE)
+_ESCAPE = re.compile(r"\\(.)")
+_CALL = re.compile(r"(\w+)\.(\w+)\((.*)\)\s*$")
+_FAILURE = re.compile(r"\*\*\*? ")
+_CHUNK = 1000
+_READ_ONLY = ("id", "created_at", "updated_at", "__class__")
 
 
 def parse(arg):
-    curly_braces = re.search(r"\{(.*?)\}", arg)
-    brackets = re.search(r"\[(.*?)\]", arg)
-    if curly_braces is None:
-        if brackets is None:
-            return [i.strip(",") for i in split(arg)]
+    """Split a command line into its arguments.
+
+    Arguments are separated by blanks or commas. Quoted strings keep
+    their blanks, and {...} or [...] groups are kept whole.
+    """
+    args = []
+    for group, double, single, word in _TOKEN.findall(arg):
+        if double:
+            args.append(_ESCAPE.sub(r"\1", double))
         else:
-            lexer = split(arg[:brackets.span()[0]])
-            retl = [i.strip(",") for i in lexer]
-            retl.append(brackets.group())
-            return retl
-    else:
-        lexer = split(arg[:curly_braces.span()[0]])
-        retl = [i.strip(",") for i in lexer]
-        retl.append(curly_braces.group())
-        return retl
+            args.append(group or single or word)
+    return args
+
+
+def convert(model, value):
+    """Cast the attributes of value declared on model to their type.
+
+    value is a to_dict() dictionary. int and float attributes accept
+    numbers and numeric strings, an int attribute rejecting fractional
+    values; other declared attributes must already have their type.
+    id must be a string, created_at and updated_at isoformat strings.
+    Raises ValueError when a value does not fit.
+    """
+    name = value.get("__class__", model.__name__)
+    if name != model.__name__:
+        raise ValueError("__class__ is {}".format(name))
+    if not isinstance(value.get("id", ""), str):
+        raise ValueError("id must be str, not {!r}".format(value["id"]))
+    for name in ("created_at", "updated_at"):
+        if name in value:
+            try:
+                datetime.fromisoformat(value[name])
+            except (TypeError, ValueError):
+                raise ValueError("{} must be an isoformat string, not {!r}"
+                                 .format(name, value[name])) from None
+    for name, item in value.items():
+        default = getattr(model, name, None)
+        if name.startswith("_") or default is None or callable(default):
+            continue
+        kind = type(default)
+        if type(item) is kind:
+            continue
+        if kind in (int, float) and not isinstance(item, bool) and \
+                isinstance(item, (int, float, str)):
+            try:
+                number = float(item)
+            except ValueError:
+                number = None
+            if number is not None and (kind is float or number.is_integer()):
+                value[name] = kind(number)
+                continue
+        raise ValueError("{} must be {}, not {!r}".format(
+            name, kind.__name__, item))
+    return value
+
+
+class _Output:
+    """Stream splitting the output of a batch command by lines.
+
+    Lines starting with "** " or "*** ", the messages of a failed
+    command, are written to errors with the line number of the command
+    being run and set failed; the others go to out.
+    """
+
+    def __init__(self, out, errors):
+        """Initialize with no command run yet."""
+        self.out = out
+        self.errors = errors
+        self.number = 0
+        self.failed = False
+        self.__partial = ""
+
+    def write(self, text):
+        """Write text, passing on every line it completes."""
+        if "\n" not in text:
+            self.__partial += text
+            return len(text)
+        lines = (self.__partial + text).split("\n")
+        self.__partial = lines.pop()
+        for line in lines:
+            self.__emit(line)
+        return len(text)
+
+    def flush(self):
+        """Pass on the last line, even if incomplete."""
+        if self.__partial:
+            self.__emit(self.__partial)
+            self.__partial = ""
+
+    def __emit(self, line):
+        """Write one line where it belongs."""
+        if _FAILURE.match(line):
+            self.failed = True
+            print("line {}: {}".format(self.number, line), file=self.errors)
+        else:
+            self.out.write(line + "\n")
 
 
 class HBNBCommand(cmd.Cmd):
     """Command interpreter for HBNB program."""
     prompt = "(hbnb) "
     __model_list = {
-        "BaseModel",
-        "User",
-        "State",
-        "City",
-        "Place",
-        "Amenity",
-        "Review"
+        "BaseModel": BaseModel,
+        "User": User,
+        "State": State,
+        "City": City,
+        "Place": Place,
+        "Amenity": Amenity,
+        "Review": Review
         }
 
+    def run_batch(self, lines, errors=sys.stderr):
+        """Run the commands of lines under a single storage write.
+
+        Blank lines and lines starting with # are skipped. A command
+        that fails, printing a "** ... **" message or raising an error,
+        is reported on errors with its line number and the next one is
+        run; the run stops at quit or EOF. The storage is flushed, a
+        failed write being reported too, and throughput statistics are
+        printed on errors at the end. Returns the number of failures.
+        """
+        count = failed = 0
+        output = _Output(sys.stdout, errors)
+        start = time.perf_counter()
+        try:
+            with storage.batch(), redirect_stdout(output):
+                for number, line in enumerate(lines, 1):
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    count += 1
+                    output.number = number
+                    output.failed = stop = False
+                    try:
+                        stop = self.onecmd(line)
+                    except Exception as error:
+                        output.failed = True
+                        print("line {}: {}: {}".format(
+                            number, type(error).__name__, error),
+                            file=errors)
+                    output.flush()
+                    failed += output.failed
+                    if stop:
+                        break
+            storage.flush()
+        except Exception as error:
+            failed += 1
+            print("save: {}: {}".format(type(error).__name__, error),
+                  file=errors)
+        elapsed = time.perf_counter() - start
+        print("{} commands, {} errors in {:.3f}s ({:.0f} commands/s)".format(
+            count, failed, elapsed, count / elapsed if elapsed else 0),
+            file=errors)
+        return failed
+
     def do_quit(self, arg):
         """Quit command to exit the program."""
+        storage.flush()
         return True
 
     def do_EOF(self, arg):
         """Handle the End-of-File (EOF) to exit the program."""
         print("")  # Print a new line before exiting
+        storage.flush()
         return True
 
+    def precmd(self, line):
+        """Take in what other processes saved before running a command."""
+        storage.refresh()
+        return line
+
     def emptyline(self):
         """Do nothing on an empty line."""
         pass
 
+    def default(self, line):
+        """Handle the <class name>.<command>(<arguments>) syntax."""
+        match = _CALL.match(line)
+        if match is not None:
+            class_name, command, args = match.groups()
+            method = getattr(self, "do_" + command, None)
+            if method is not None:
+                return method("{} {}".format(class_name, args).strip())
+        print("*** Unknown syntax: {}".format(line))
+        return False
+
     def do_create(self, arg):
         """Create a new instance, save it, and print the ID."""
 
@@ -62,13 +225,13 @@ class HBNBCommand(cmd.Cmd):
         elif arg not in HBNBCommand.__model_list:
             print("** class doesn't exist **")
         else:
-            print(eval(arg)().id)
+            print(HBNBCommand.__model_list[arg]().id)
             storage.save()
 
     def do_show(self, arg):
         """Print the string representation of
         an instance based on class name and ID."""
-        args = shlex.split(arg)
+        args = parse(arg)
         if not args:
             print("** class name missing **")
             return
@@ -83,17 +246,15 @@ class HBNBCommand(cmd.Cmd):
             return
 
         instance_id = args[1]
-        key = "{}.{}".format(class_name, instance_id)
-        data = storage.all()
-
-        if key not in data:
+        obj = storage.get(class_name, instance_id)
+        if obj is None:
             print("** no instance found **")
             return
-        print(f"[{class_name}] ({instance_id}) {data[key]}")
+        print(obj)
 
     def do_destroy(self, arg):
         """Deletes an instance based on class name and id."""
-        args = shlex.split(arg)
+        args = parse(arg)
         if not args:
             print("** class name missing **")
             return
@@ -108,32 +269,153 @@ class HBNBCommand(cmd.Cmd):
             return
 
         instance_id = args[1]
-        key = "{}.{}".format(class_name, instance_id)
-        print(key)
-        if key.split(".")[0] not in HBNBCommand.__model_list:
+        obj = storage.get(class_name, instance_id)
+        if obj is None:
             print("** no instance found **")
             return
-        data = storage.all()
-        del data[key]
-        with open('file.json', 'w') as file:
-            json.dump(data, file, indent=2)
+        storage.delete(obj)
+        storage.save()
 
     def do_all(self, arg):
-        """Print all string representations of instances."""
+        """Print all string representations of instances.
+
+        Usage: all <class> [limit=<n>] [offset=<n>] [after=<id>] [stream]
+
+        With any option, the instances are printed one per line, in id
+        order, as they are read from the storage: limit and offset page
+        through them, and after=<id> resumes after the last id printed.
+        """
+        args = parse(arg)
+        if not args or args[0] not in HBNBCommand.__model_list:
+            print("** class doesn't exist **")
+            return
+        if len(args) == 1:
+            print([str(value) for value in storage.all(args[0]).values()])
+            return
+        options = {"limit": None, "offset": 0, "after": None}
+        for option in args[1:]:
+            name, _, value = option.partition("=")
+            if option == "stream":
+                continue
+            if name not in options or not value:
+                print("** invalid option: {} **".format(option))
+                return
+            if name != "after":
+                if not value.isdigit():
+                    print("** invalid option: {} **".format(option))
+                    return
+                value = int(value)
+            options[name] = value
+        stop = None
+        if options["limit"] is not None:
+            stop = options["offset"] + options["limit"]
+        objects = storage.iterate(args[0], after=options["after"])
+        for obj in islice(objects, options["offset"], stop):
+            print(obj)
+
+    def do_count(self, arg):
+        """Print the number of instances of a class."""
         if arg not in HBNBCommand.__model_list:
             print("** class doesn't exist **")
             return
-        data = storage.all()
-        filtered = []
-        for key, value in data.items():
-            if key.startswith(arg):
-                split_data = key.split(".")
-                filtered.append(f"[{split_data[0]}] ({split_data[1]}) {value}")
-        print(filtered)
+        print(storage.count(arg))
+
+    def do_search(self, arg):
+        """Print the instances of a class best matching some words."""
+        args = arg.split(maxsplit=1)
+        if not args:
+            print("** class name missing **")
+            return
+
+        class_name = args[0]
+        if class_name not in HBNBCommand.__model_list:
+            print("** class doesn't exist **")
+            return
+
+        if len(args) < 2:
+            print("** search text missing **")
+            return
+
+        found = storage.search(class_name, args[1])
+        print([str(value) for value in found.values()])
+
+    def do_import(self, arg):
+        """Create instances of a class from a file of JSON lines.
+
+        The file is read line by line and every object is added within
+        a single storage batch, saved once at the end. Lines that are
+        not valid UTF-8 objects of the class are reported and skipped.
+        """
+        args = parse(arg)
+        model = self.__file_command(args)
+        if model is None:
+            return
+        try:
+            f = open(args[1], "rb")
+        except OSError:
+            print("** file doesn't exist **")
+            return
+        imported = skipped = 0
+        with f, storage.batch():
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    value = json.loads(line.decode())
+                    if not isinstance(value, dict):
+                        raise ValueError("not a JSON object")
+                    obj = model.from_dict(convert(model, value))
+                except ValueError as error:
+                    print("** line {}: {} **".format(number, error))
+                    skipped += 1
+                    continue
+                storage.new(obj)
+                imported += 1
+        print("{} imported, {} skipped".format(imported, skipped))
+
+    def do_export(self, arg):
+        """Write the instances of a class to a file of JSON lines.
+
+        The instances are read from the storage in id order and
+        written in chunks of _CHUNK lines.
+        """
+        args = parse(arg)
+        model = self.__file_command(args)
+        if model is None:
+            return
+        try:
+            f = open(args[1], "w")
+        except OSError:
+            print("** can't write file **")
+            return
+        objects = storage.iterate(model)
+        exported = 0
+        with f:
+            while True:
+                chunk = [json.dumps(obj.to_dict()) + "\n"
+                         for obj in islice(objects, _CHUNK)]
+                if not chunk:
+                    break
+                f.writelines(chunk)
+                exported += len(chunk)
+        print("{} exported".format(exported))
+
+    def __file_command(self, args):
+        """Return the class of an import/export command, or None."""
+        if not args:
+            print("** class name missing **")
+            return None
+        if args[0] not in HBNBCommand.__model_list:
+            print("** class doesn't exist **")
+            return None
+        if len(args) < 2:
+            print("** file name missing **")
+            return None
+        return HBNBCommand.__model_list[args[0]]
 
     def do_update(self, arg):
         """Updates an instance based on class name and id."""
-        args = shlex.split(arg)
+        args = parse(arg)
         if not args:
             print("** class name missing **")
             return
@@ -148,9 +430,8 @@ class HBNBCommand(cmd.Cmd):
             return
 
         instance_id = args[1]
-        data = storage.all()
-        key = "{}.{}".format(class_name, instance_id)
-        if key not in data:
+        obj = storage.get(class_name, instance_id)
+        if obj is None:
             print("** no instance found **")
             return
 
@@ -158,19 +439,35 @@ class HBNBCommand(cmd.Cmd):
             print("** attribute name missing **")
             return
 
-        attribute_name = args[2]
-        if len(args) < 4:
+        if args[2].startswith("{"):
+            try:
+                attributes = literal_eval(args[2])
+            except (SyntaxError, ValueError):
+                attributes = None
+            if not isinstance(attributes, dict) or \
+                    not all(isinstance(name, str) for name in attributes):
+                print("** invalid dictionary **")
+                return
+        elif len(args) < 4:
             print("** value missing **")
             return
+        else:
+            attributes = {args[2]: args[3]}
 
-        attribute_value = args[3]
-        instance = data[key]
-
-        instance[attribute_name] = attribute_value
-        data[key] = instance
-        with open('file.json', 'w') as file:
-            json.dump(data, file, indent=2)
+        for attribute_name in attributes:
+            if attribute_name in _READ_ONLY:
+                print("** {} can't be updated **".format(attribute_name))
+                return
+        for attribute_name, attribute_value in attributes.items():
+            setattr(obj, attribute_name, attribute_value)
+        obj.save()
 
 
 if __name__ == "__main__":
-    HBNBCommand().cmdloop()
+    if len(sys.argv) == 3 and sys.argv[1] == "--batch":
+        with open(sys.argv[2], "r") as f:
+            sys.exit(1 if HBNBCommand().run_batch(f) else 0)
+    elif not sys.stdin.isatty():
+        sys.exit(1 if HBNBCommand().run_batch(sys.stdin) else 0)
+    else:
+        HBNBCommand().cmdloop()
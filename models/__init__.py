@@ -1,5 +1,31 @@
 #!/usr/bin/python3
+import atexit
+import os
 from models.engine.file_storage import FileStorage
 
-storage = FileStorage()
+if os.getenv("HBNB_TYPE_STORAGE") == "db":
+    from models.engine.db_storage import DBStorage
+    storage = DBStorage(os.getenv("HBNB_DB_PATH", "hbnb.db"))
+else:
+    binary = os.getenv("HBNB_STORAGE_FORMAT") == "binary"
+    # Both formats use file.json, reload() telling them apart, so a store
+    # converts by switching HBNB_STORAGE_FORMAT. file.bin, where binary
+    # stores used to be written, is still read when there is no file.json.
+    path = "file.json"
+    if os.path.exists("file.bin") and not os.path.exists(path):
+        path = "file.bin"
+    fsync_interval = os.getenv("HBNB_STORAGE_FSYNC")
+    write_behind = os.getenv("HBNB_STORAGE_WRITE_BEHIND")
+    storage = FileStorage(
+        path,
+        journal=os.getenv("HBNB_STORAGE_JOURNAL") == "1",
+        lazy=os.getenv("HBNB_STORAGE_LAZY") == "1",
+        fsync_interval=float(fsync_interval) if fsync_interval else None,
+        binary=binary,
+        sharded=os.getenv("HBNB_STORAGE_SHARDED") == "1",
+        threadsafe=os.getenv("HBNB_STORAGE_THREADSAFE") == "1",
+        write_behind=float(write_behind) if write_behind else None,
+        multiprocess=os.getenv("HBNB_STORAGE_MULTIPROCESS") == "1")
+    if write_behind:
+        atexit.register(storage.close)
 storage.reload()
@@ -20,16 +20,62 @@ class BaseModel:
         if len(kwargs) > 0:
             for key, value in kwargs.items():
                 if key == "created_at" or key == "updated_at":
-                    self.__dict__[key] = datetime.strptime(value, i)
-                else:
+                    if not isinstance(value, datetime):
+                        value = datetime.strptime(value, i)
+                    self.__dict__[key] = value
+                elif key != "__class__":
                     self.__dict__[key] = value
         else:
             storage.new(self)
 
+    @classmethod
+    def from_dict(cls, value):
+        """Return an instance built from a to_dict() dictionary.
+
+        Unlike cls(**value), an id and timestamps are only generated
+        when value lacks them, and timestamps are parsed with
+        datetime.fromisoformat. Like it, the instance is not added to
+        the storage.
+        """
+        obj = cls.__new__(cls)
+        attributes = obj.__dict__
+        # The keys come in the order cls() gives them.
+        attributes["id"] = attributes["created_at"] = None
+        attributes["updated_at"] = None
+        attributes.update(value)
+        attributes.pop("__class__", None)
+        if "id" not in value:
+            attributes["id"] = str(uuid.uuid4())
+        for key in ("created_at", "updated_at"):
+            moment = attributes[key]
+            if key not in value:
+                attributes[key] = datetime.now()
+            elif isinstance(moment, str):
+                attributes[key] = datetime.fromisoformat(moment)
+        return obj
+
+    @classmethod
+    def from_dicts(cls, values):
+        """Return the list of the instances of cls built from values."""
+        from_dict = cls.from_dict
+        return [from_dict(value) for value in values]
+
+    def __setattr__(self, name, value):
+        """Set an attribute and let the storage know the object changed."""
+        super().__setattr__(name, value)
+        storage.touch(self, name)
+
+    def __delattr__(self, name):
+        """Delete an attribute and let the storage know the object changed."""
+        super().__delattr__(name)
+        storage.touch(self, name)
+
     def save(self):
         """updates the public instance attribute
         updated_at with the current datetime"""
         self.updated_at = datetime.now()
+        if storage.get(type(self), self.id) is not self:
+            storage.new(self)
         storage.save()
 
     def __str__(self):
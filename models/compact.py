@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+"""Defines the compact, slot-based representation of the models.
+
+A compact record has no __dict__: the attributes declared on its model
+class are slots, the id is kept as 16 bytes when it is a canonical
+uuid, and created_at/updated_at as integer microseconds since the
+epoch. A record reads like the instance it was built from: same
+attributes, same to_dict() and same __str__.
+
+Records are meant for large read-mostly datasets; they are not tracked
+by the storage. Use to_model() to get a regular instance back.
+
+    >>> record = compact(place)
+    >>> record.name == place.name and record.to_dict() == place.to_dict()
+    True
+"""
+from datetime import datetime
+from models.engine.binary import (decode_id, decode_time, encode_id,
+                                  encode_time)
+
+_classes = {}
+_orders = {}
+
+
+class CompactModel:
+    """Base of the compact record classes built by compact_class().
+
+    The names set besides id, created_at and updated_at are remembered
+    in the order they were set, as a tuple shared by every record set
+    in the same order, so that to_dict() and __str__ list them in the
+    order of the instance.
+
+    Attributes:
+        model (type): the model class the records stand for.
+        fields (tuple): the attribute names declared on model.
+    """
+    __slots__ = ("_id", "_created_at", "_updated_at", "_extra", "_order")
+    model = None
+    fields = ()
+
+    def __init__(self, **kwargs):
+        """Initialize a record from the key/value pairs of to_dict().
+
+        Attributes not declared on the model class are kept in a
+        dictionary of their own.
+        """
+        self._extra = None
+        self._order = ()
+        for key, value in kwargs.items():
+            if key != "__class__":
+                setattr(self, key, value)
+
+    @classmethod
+    def from_model(cls, obj):
+        """Return the record of the model instance obj."""
+        return cls(**obj.__dict__)
+
+    def to_model(self):
+        """Return a model instance holding the attributes of the record."""
+        return self.model.from_dict(self.__values())
+
+    @property
+    def id(self):
+        """The id of the record."""
+        return decode_id(self._id)
+
+    @id.setter
+    def id(self, value):
+        self._id = encode_id(value)
+
+    @property
+    def created_at(self):
+        """The creation datetime of the record."""
+        return decode_time(self._created_at, datetimes=True)
+
+    @created_at.setter
+    def created_at(self, value):
+        self._created_at = _encode_time(value)
+
+    @property
+    def updated_at(self):
+        """The datetime of the last update of the record."""
+        return decode_time(self._updated_at, datetimes=True)
+
+    @updated_at.setter
+    def updated_at(self, value):
+        self._updated_at = _encode_time(value)
+
+    def __setattr__(self, name, value):
+        """Set a slot, or an attribute not declared on the model."""
+        if name in CompactModel.__slots__ or \
+                name in ("id", "created_at", "updated_at"):
+            object.__setattr__(self, name, value)
+            return
+        if name in self.fields:
+            object.__setattr__(self, name, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[name] = value
+        if name not in self._order:
+            order = self._order + (name,)
+            self._order = _orders.setdefault(order, order)
+
+    def __getattr__(self, name):
+        """Return the extra attribute name, else the model default."""
+        extra = object.__getattribute__(self, "_extra")
+        if extra is not None and name in extra:
+            return extra[name]
+        if name in self.fields:
+            return getattr(self.model, name)
+        raise AttributeError("'{}' object has no attribute '{}'".format(
+            type(self).__name__, name))
+
+    def __values(self):
+        """Return the attributes set on the record, like __dict__."""
+        values = {}
+        for name in ("id", "created_at", "updated_at"):
+            try:
+                object.__getattribute__(self, "_" + name)
+            except AttributeError:
+                continue
+            values[name] = getattr(self, name)
+        for name in self._order:
+            if name in self.fields:
+                values[name] = object.__getattribute__(self, name)
+            else:
+                values[name] = self._extra[name]
+        return values
+
+    def __str__(self):
+        """print: [<class name>] (<self.id>) <attributes>"""
+        return f"[{self.model.__name__}] ({self.id}) {self.__values()}"
+
+    def to_dict(self):
+        """Return the dictionary BaseModel.to_dict() would return."""
+        variable = self.__values()
+        variable["updated_at"] = self.updated_at.isoformat()
+        variable["created_at"] = self.created_at.isoformat()
+        variable["__class__"] = self.model.__name__
+        return variable
+
+
+def compact_class(model):
+    """Return the compact record class of the model class model."""
+    cls = _classes.get(model)
+    if cls is None:
+        fields = tuple(name for name in vars(model)
+                       if not name.startswith("_") and
+                       not callable(getattr(model, name)))
+        cls = _classes[model] = type(
+            "Compact" + model.__name__, (CompactModel,),
+            {"__slots__": fields, "model": model, "fields": fields})
+    return cls
+
+
+def compact(obj):
+    """Return the compact record of the model instance obj."""
+    return compact_class(type(obj)).from_model(obj)
+
+
+def _encode_time(value):
+    """Return value as encode_time() does, parsing isoformat strings,
+    as found in to_dict(), first.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return encode_time(value)
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+"""Defines the asyncio methods of FileStorage.
+
+Every method runs its synchronous counterpart in `executor`, the
+default executor of the loop unless set, so the event loop never
+waits for the disk. Since the store is then used from the executor
+threads and from the loop at once, it must be thread-safe:
+
+    storage = FileStorage("file.json", threadsafe=True)
+    place = await storage.aget(Place, place_id)
+    async for place in storage.aiter(Place):
+        ...
+    await storage.asave()
+"""
+import asyncio
+import functools
+import itertools
+import weakref
+
+
+class _Saves:
+    """The state of the saves asked for on one event loop."""
+
+    def __init__(self):
+        """Initialize with no save in flight."""
+        self.gate = asyncio.Lock()
+        self.next = None
+
+
+class AsyncStorage:
+    """Mixin adding asyncio methods to a thread-safe storage.
+
+    Attributes:
+        executor (concurrent.futures.Executor): where the storage
+            methods run; None for the default executor of the loop.
+    """
+    executor = None
+
+    async def asave(self):
+        """Persist every change made before the call, like save().
+
+        Saves run one at a time, and the calls made while one runs all
+        wait for the same next save, so many concurrent calls cost one
+        or two writes.
+        """
+        saves = self.__saves()
+        if saves.next is None:
+            saves.next = asyncio.ensure_future(self.__save(saves))
+        await asyncio.shield(saves.next)
+
+    async def __save(self, saves):
+        """Run save() once the save in flight, if any, is done."""
+        async with saves.gate:
+            saves.next = None
+            await self.__run(self.save)
+
+    def __saves(self):
+        """Return the save state of the running loop."""
+        loop = asyncio.get_running_loop()
+        try:
+            states = self.__states
+        except AttributeError:
+            states = self.__states = weakref.WeakKeyDictionary()
+        if loop not in states:
+            states[loop] = _Saves()
+        return states[loop]
+
+    async def aget(self, cls, id):
+        """Return the object of cls with the given id, or None."""
+        return await self.__run(self.get, cls, id)
+
+    async def aall(self, cls=None):
+        """Return the stored objects, optionally only those of cls."""
+        return await self.__run(self.all, cls)
+
+    async def acount(self, cls=None):
+        """Return the number of stored objects, optionally of cls."""
+        return await self.__run(self.count, cls)
+
+    async def aquery(self, cls, **attrs):
+        """Return the objects of cls whose attributes equal attrs."""
+        return await self.__run(self.query, cls, **attrs)
+
+    async def asearch(self, cls, text, limit=10):
+        """Return the objects of cls best matching the words of text."""
+        return await self.__run(self.search, cls, text, limit)
+
+    async def aiter(self, cls, after=None, chunk=100):
+        """Yield the objects of cls like iterate().
+
+        The objects are read chunk at a time in the executor.
+        """
+        objects = self.iterate(cls, after)
+        while True:
+            page = await self.__run(list, itertools.islice(objects, chunk))
+            if not page:
+                return
+            for obj in page:
+                yield obj
+
+    async def areload(self):
+        """Read the files again, like reload()."""
+        return await self.__run(self.reload)
+
+    async def arefresh(self):
+        """Take in what other processes saved, like refresh()."""
+        return await self.__run(self.refresh)
+
+    async def aflush(self):
+        """Write every pending change now, like flush()."""
+        await self.__run(self.flush)
+
+    async def __run(self, method, *args, **kwargs):
+        """Return method(*args, **kwargs), run in the executor."""
+        if not self.threadsafe:
+            raise RuntimeError("the asyncio methods need a thread-safe "
+                               "storage")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(method, *args, **kwargs))
@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+"""Defines the compact binary snapshot format of FileStorage.
+
+A binary snapshot starts with MAGIC and is followed by chunks of up to
+CHUNK records, each one a marshal blob preceded by its length as a
+4-byte little-endian integer. A chunk is a (shapes, rows) pair: a shape is
+a class name followed by the attribute names of a record, and the
+shapes first used in the chunk are appended to a table shared by the
+whole file. Every row is (shape number, id, created_at, updated_at,
+values), so names are written once per file rather than once per
+object. uuid ids are stored as 16 bytes and the created_at/updated_at
+timestamps as integer microseconds since the epoch, converted by
+encode_id()/decode_id() and encode_time()/decode_time(), which
+models.compact uses too.
+
+In memory a record is the tuple
+(class name, id, created_at, updated_at, names, values),
+see encode() and decode().
+"""
+from datetime import datetime, timedelta
+import marshal
+import struct
+import uuid
+
+MAGIC = b"HBNB\x01"
+CHUNK = 10000
+
+_LENGTH = struct.Struct("<I")
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def encode(value):
+    """Return the record of a to_dict() dictionary."""
+    names = tuple(name for name in value
+                  if name not in ("__class__", "id", "created_at",
+                                  "updated_at"))
+    return (value["__class__"], encode_id(value.get("id")),
+            encode_time(value.get("created_at")),
+            encode_time(value.get("updated_at")), names,
+            tuple(value[name] for name in names))
+
+
+def decode(record, datetimes=False):
+    """Return the to_dict() dictionary of a record.
+
+    With datetimes, timestamps are returned as datetime objects rather
+    than isoformat strings.
+    """
+    cls, id, created_at, updated_at, names, values = record
+    value = {"id": decode_id(id)}
+    if created_at is not None:
+        value["created_at"] = decode_time(created_at, datetimes)
+    if updated_at is not None:
+        value["updated_at"] = decode_time(updated_at, datetimes)
+    value.update(zip(names, values))
+    value["__class__"] = cls
+    return value
+
+
+def key(record):
+    """Return the storage key, <class name>.<id>, of a record."""
+    return "{}.{}".format(record[0], decode_id(record[1]))
+
+
+def dump(file, records):
+    """Write MAGIC followed by records to the binary file."""
+    file.write(MAGIC)
+    table = {}
+    shapes = []
+    rows = []
+    for cls, id, created_at, updated_at, names, values in records:
+        shape = (cls,) + names
+        number = table.get(shape)
+        if number is None:
+            number = table[shape] = len(table)
+            shapes.append(shape)
+        rows.append((number, id, created_at, updated_at, values))
+        if len(rows) == CHUNK:
+            _write_chunk(file, shapes, rows)
+            shapes = []
+            rows = []
+    if rows:
+        _write_chunk(file, shapes, rows)
+
+
+def load(file):
+    """Yield the records of a binary file opened after its MAGIC."""
+    table = []
+    while True:
+        header = file.read(_LENGTH.size)
+        if not header:
+            return
+        shapes, rows = marshal.loads(file.read(_LENGTH.unpack(header)[0]))
+        table.extend((shape[0], shape[1:]) for shape in shapes)
+        for number, id, created_at, updated_at, values in rows:
+            cls, names = table[number]
+            yield (cls, id, created_at, updated_at, names, values)
+
+
+def _write_chunk(file, shapes, rows):
+    """Write one length-prefixed chunk to file."""
+    blob = marshal.dumps((shapes, rows))
+    file.write(_LENGTH.pack(len(blob)))
+    file.write(blob)
+
+
+def is_binary(path):
+    """Return True if path holds a binary snapshot."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def encode_id(id):
+    """Return the 16 bytes of a canonical uuid string, else id itself."""
+    if isinstance(id, str) and len(id) == 36:
+        try:
+            raw = uuid.UUID(id)
+        except ValueError:
+            return id
+        if str(raw) == id:
+            return raw.bytes
+    return id
+
+
+def decode_id(id):
+    """Return the string of an id written by encode_id."""
+    if isinstance(id, bytes):
+        h = id.hex()
+        return "{}-{}-{}-{}-{}".format(h[:8], h[8:12], h[12:16], h[16:20],
+                                       h[20:])
+    return id
+
+
+def encode_time(value):
+    """Return a naive datetime, or its isoformat string, as microseconds
+    since the epoch, else value itself.
+    """
+    if isinstance(value, str):
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+        if moment.isoformat() != value:
+            return value
+    elif isinstance(value, datetime):
+        moment = value
+    else:
+        return value
+    if moment.tzinfo is not None:
+        return value
+    return (moment - _EPOCH) // _MICROSECOND
+
+
+def decode_time(value, datetimes=False):
+    """Return the timestamp of a value written by encode_time."""
+    if isinstance(value, int):
+        moment = _EPOCH + value * _MICROSECOND
+        return moment if datetimes else moment.isoformat()
+    return value
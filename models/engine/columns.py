@@ -0,0 +1,250 @@
+#!/usr/bin/python3
+"""Defines the columnar views maintained by FileStorage."""
+from array import array
+from itertools import compress, filterfalse, repeat
+import math
+import operator
+
+_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+_AGGREGATES = {
+    "count": len,
+    "sum": sum,
+    "mean": lambda values: sum(values) / len(values) if values else None,
+    "min": lambda values: min(values) if values else None,
+    "max": lambda values: max(values) if values else None,
+}
+
+
+class Columns:
+    """Columnar copy of some attributes of the objects of one class.
+
+    Every object gets a row. Numeric attributes are kept in
+    array("d") columns, missing or non-numeric values being NaN; string
+    attributes, such as the *_id foreign keys, are dictionary encoded
+    as array("q") codes into a table of distinct values, -1 standing
+    for a missing value. Rows of deleted objects are reused.
+
+    Filters return a mask, bytes holding 1 for every selected row,
+    computed with map() over whole columns; masks combine with
+    both() and either(), and are passed to keys(), aggregate() and
+    group_by().
+
+    Attributes:
+        names (tuple): the attributes held in columns.
+    """
+
+    def __init__(self, model, names=None):
+        """Initialize empty columns for the attributes names of model.
+
+        By default every numeric attribute declared on model gets a
+        column, and so does every string attribute ending with "_id".
+        """
+        if names is None:
+            names = [name for name, value in vars(model).items()
+                     if not name.startswith("_") and (
+                         isinstance(value, (int, float)) or
+                         isinstance(value, str) and name.endswith("_id"))]
+        self.names = tuple(names)
+        self.__numeric = {}
+        self.__codes = {}
+        self.__values = {}
+        self.__lookup = {}
+        for name in self.names:
+            if isinstance(getattr(model, name, ""), str):
+                self.__codes[name] = array("q")
+                self.__values[name] = []
+                self.__lookup[name] = {}
+            else:
+                self.__numeric[name] = array("d")
+        self.__keys = []
+        self.__rows = {}
+        self.__free = []
+        self.__live = bytearray()
+
+    def __len__(self):
+        """Return the number of objects held."""
+        return len(self.__rows)
+
+    def add(self, key, obj):
+        """Store the attributes of obj in the row of key."""
+        row = self.__rows.get(key)
+        if row is None:
+            row = self.__allocate(key)
+        for name, column in self.__numeric.items():
+            column[row] = self.__number(getattr(obj, name, None))
+        for name, column in self.__codes.items():
+            column[row] = self.__code(name, getattr(obj, name, None))
+
+    def discard(self, key):
+        """Free the row of key, if any."""
+        row = self.__rows.pop(key, None)
+        if row is None:
+            return
+        self.__keys[row] = None
+        self.__live[row] = 0
+        for column in self.__numeric.values():
+            column[row] = math.nan
+        for column in self.__codes.values():
+            column[row] = -1
+        self.__free.append(row)
+
+    def clear(self):
+        """Drop every row."""
+        for column in self.__numeric.values():
+            del column[:]
+        for name, column in self.__codes.items():
+            del column[:]
+            self.__values[name].clear()
+            self.__lookup[name].clear()
+        self.__keys.clear()
+        self.__rows.clear()
+        self.__free.clear()
+        self.__live.clear()
+
+    def filter(self, name, op, value):
+        """Return the mask of the rows where `name op value` holds.
+
+        op is one of ==, !=, <, <=, >, >=, "between", for which value is
+        a (low, high) pair of inclusive bounds, or "in", for which value
+        is a collection. Missing values never match.
+        """
+        if op == "between":
+            return self.both(self.filter(name, ">=", value[0]),
+                             self.filter(name, "<=", value[1]))
+        if name in self.__codes:
+            return self.__filter_codes(name, op, value)
+        column = self.__numeric[name]
+        if op == "in":
+            wanted = {float(v) for v in value}
+            mask = bytes(map(wanted.__contains__, column))
+        else:
+            mask = bytes(map(_OPERATORS[op], column,
+                             repeat(float(value), len(column))))
+            if op == "!=":
+                mask = self.both(mask, bytes(map(operator.eq, column,
+                                                 column)))
+        return self.both(mask, self.__live)
+
+    def __filter_codes(self, name, op, value):
+        """Return the mask of a filter on the encoded column name."""
+        column = self.__codes[name]
+        lookup = self.__lookup[name]
+        if op == "in":
+            wanted = {lookup[v] for v in value if v in lookup}
+            return bytes(map(wanted.__contains__, column))
+        if op in ("==", "!="):
+            code = lookup.get(value, -2)
+            mask = bytes(map(_OPERATORS[op], column,
+                             repeat(code, len(column))))
+            if op == "!=":
+                mask = self.both(mask, bytes(map(operator.ne, column,
+                                                 repeat(-1, len(column)))))
+            return mask
+        compare = _OPERATORS[op]
+        matching = {code for code, text in enumerate(self.__values[name])
+                    if compare(text, value)}
+        return bytes(map(matching.__contains__, column))
+
+    @staticmethod
+    def both(*masks):
+        """Return the mask of the rows selected by every mask."""
+        result = -1
+        for mask in masks:
+            result &= int.from_bytes(mask, "little")
+        return result.to_bytes(len(masks[0]), "little")
+
+    @staticmethod
+    def either(*masks):
+        """Return the mask of the rows selected by any mask."""
+        result = 0
+        for mask in masks:
+            result |= int.from_bytes(mask, "little")
+        return result.to_bytes(len(masks[0]), "little")
+
+    def keys(self, mask=None):
+        """Return the keys of the rows selected by mask, or of all."""
+        return list(compress(self.__keys, self.__mask(mask)))
+
+    def column(self, name, mask=None):
+        """Return the values of the column name in the selected rows."""
+        if name in self.__codes:
+            values = self.__values[name]
+            return [values[code] if code >= 0 else None
+                    for code in compress(self.__codes[name],
+                                         self.__mask(mask))]
+        return list(compress(self.__numeric[name], self.__mask(mask)))
+
+    def aggregate(self, name, func, mask=None):
+        """Return func over the numeric column name in the selected rows.
+
+        func is one of "count", "sum", "mean", "min" and "max"; missing
+        values are skipped.
+        """
+        values = compress(self.__numeric[name], self.__mask(mask))
+        return _AGGREGATES[func](list(filterfalse(math.isnan, values)))
+
+    def group_by(self, by, name, func, mask=None):
+        """Return {value of by: aggregate of name} over the selected rows.
+
+        by must be an encoded (string) column; rows where by is missing
+        are left out.
+        """
+        mask = self.__mask(mask)
+        values = self.__values[by]
+        # One list per code, plus a last one collecting the code -1.
+        groups = [[] for _ in range(len(values) + 1)]
+        append = [group.append for group in groups]
+        for code, value in zip(compress(self.__codes[by], mask),
+                               compress(self.__numeric[name], mask)):
+            append[code](value)
+        aggregate = _AGGREGATES[func]
+        return {values[code]: aggregate(list(filterfalse(math.isnan, group)))
+                for code, group in enumerate(groups[:-1]) if group}
+
+    def __mask(self, mask):
+        """Return mask, or the mask of the live rows when it is None."""
+        return self.__live if mask is None else mask
+
+    def __allocate(self, key):
+        """Return a free row for key, growing the columns if needed."""
+        if self.__free:
+            row = self.__free.pop()
+            self.__keys[row] = key
+            self.__live[row] = 1
+        else:
+            row = len(self.__keys)
+            self.__keys.append(key)
+            self.__live.append(1)
+            for column in self.__numeric.values():
+                column.append(math.nan)
+            for column in self.__codes.values():
+                column.append(-1)
+        self.__rows[key] = row
+        return row
+
+    @staticmethod
+    def __number(value):
+        """Return value as a float, or NaN if it is not a number."""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return math.nan
+
+    def __code(self, name, value):
+        """Return the code of value in the dictionary of column name."""
+        if not isinstance(value, str):
+            return -1
+        lookup = self.__lookup[name]
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(lookup)
+            self.__values[name].append(value)
+        return code
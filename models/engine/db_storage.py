@@ -0,0 +1,499 @@
+#!/usr/bin/python3
+"""Defines the DBStorage engine, backed by SQLite."""
+from contextlib import contextmanager
+import json
+import sqlite3
+import weakref
+from models.engine.file_storage import FileStorage
+from models.engine.indexes import bounds, center, distance, tokenize
+
+
+class DBStorage:
+    """SQLite storage engine with the same interface as FileStorage.
+
+    Every model class gets its own table holding the JSON text of each
+    object, plus one indexed column per attribute listed in `indexes`,
+    so get(), count(), all(cls) and query() only read the rows they
+    need. The database runs in WAL mode, which lets other connections
+    read while this one writes.
+
+    Loaded instances are kept in a weak identity map: the same row
+    always gives back the same live object while it is referenced, and
+    is read from disk again once it is not. Changes are written to the
+    database before any read, and committed by save().
+    """
+    default_indexes = FileStorage.default_indexes
+    default_text_indexes = FileStorage.default_text_indexes
+    page_size = 1000
+
+    def __init__(self, path="hbnb.db", indexes=None):
+        self.__path = path
+        self.__db = None
+        self.__objects = weakref.WeakValueDictionary()
+        self.__pending = {}
+        self.__columns = {}
+        self.__undo = None
+        if indexes is None:
+            indexes = self.default_indexes
+        self.__indexes = {cls: list(names) for cls, names in indexes.items()}
+        self.__text = dict(self.default_text_indexes)
+
+    @staticmethod
+    def classes():
+        """Return the model classes by name."""
+        return FileStorage.classes()
+
+    def reload(self):
+        """Open the database and create the missing tables."""
+        if self.__db is not None:
+            self.__db.close()
+        self.__db = sqlite3.connect(self.__path, cached_statements=256)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+        self.__objects = weakref.WeakValueDictionary()
+        self.__pending = {}
+        self.__columns = {}
+        for cls in self.classes():
+            self.__db.execute(
+                'CREATE TABLE IF NOT EXISTS "{}" (id TEXT PRIMARY KEY, '
+                'data TEXT NOT NULL)'.format(cls))
+            self.__columns[cls] = []
+            known = [row[1] for row in self.__db.execute(
+                'PRAGMA table_info("{}")'.format(cls))][2:]
+            for name in known + self.__indexes.get(cls, []):
+                self.add_index(cls, name)
+        for cls, names in list(self.__text.items()):
+            self.__create_text_table(cls, names)
+        self.__db.commit()
+
+    def flush(self):
+        """Commit every pending change now, like save()."""
+        self.save()
+
+    def refresh(self):
+        """Return False: queries always read the database, which SQLite
+        keeps consistent between processes.
+        """
+        return False
+
+    def close(self):
+        """Save pending changes and close the database."""
+        if self.__db is not None:
+            self.save()
+            self.__db.close()
+            self.__db = None
+
+    def all(self, cls=None):
+        """Return the stored objects, optionally only those of cls."""
+        if cls is None:
+            objects = {}
+            for name in self.classes():
+                objects.update(self.all(name))
+            return objects
+        cls = self.__class_name(cls)
+        self.__flush()
+        rows = self.__db.execute(
+            'SELECT id, data FROM "{}"'.format(cls))
+        return self.__build(cls, rows)
+
+    def iterate(self, cls, after=None):
+        """Yield the objects of cls in id order, from the id after after.
+
+        Rows are read page_size at a time, each page starting after the
+        last id of the previous one.
+        """
+        cls = self.__class_name(cls)
+        sql = 'SELECT id, data FROM "{}" WHERE id > ? ORDER BY id LIMIT ?'
+        sql = sql.format(cls)
+        after = "" if after is None else after
+        while True:
+            self.__flush()
+            rows = self.__db.execute(sql, (after, self.page_size))
+            rows = rows.fetchall()
+            if not rows:
+                return
+            yield from self.__build(cls, rows).values()
+            after = rows[-1][0]
+
+    def get(self, cls, id):
+        """Return the object of cls with the given id, or None."""
+        cls = self.__class_name(cls)
+        obj = self.__objects.get("{}.{}".format(cls, id))
+        if obj is not None:
+            return obj
+        self.__flush()
+        rows = self.__db.execute(
+            'SELECT id, data FROM "{}" WHERE id = ?'.format(cls), (id,))
+        return next(iter(self.__build(cls, rows).values()), None)
+
+    def count(self, cls=None):
+        """Return the number of stored objects, optionally of cls."""
+        if cls is None:
+            return sum(self.count(name) for name in self.classes())
+        cls = self.__class_name(cls)
+        self.__flush()
+        return self.__db.execute(
+            'SELECT COUNT(*) FROM "{}"'.format(cls)).fetchone()[0]
+
+    def query(self, cls, **attrs):
+        """Return the objects of cls whose attributes equal attrs.
+
+        Indexed attributes are matched by SQLite; the others are
+        checked on the rows it returns.
+        """
+        cls = self.__class_name(cls)
+        self.__flush()
+        where = [name for name in attrs if name in self.__columns[cls]]
+        sql = 'SELECT id, data FROM "{}"'.format(cls)
+        if where:
+            sql += " WHERE " + " AND ".join(
+                '"{}" = ?'.format(name) for name in where)
+        rows = self.__db.execute(sql, [attrs[name] for name in where])
+        return {key: obj for key, obj in self.__build(cls, rows).items()
+                if all(getattr(obj, name, None) == value
+                       for name, value in attrs.items())}
+
+    def add_index(self, cls, name):
+        """Maintain an indexed column for the attribute name of cls."""
+        cls = self.__class_name(cls)
+        columns = self.__columns.setdefault(cls, [])
+        if name in columns:
+            return
+        if name not in self.__indexes.setdefault(cls, []):
+            self.__indexes[cls].append(name)
+        self.__flush()
+        known = [row[1] for row in self.__db.execute(
+            'PRAGMA table_info("{}")'.format(cls))]
+        if name not in known:
+            self.__db.execute(
+                'ALTER TABLE "{}" ADD COLUMN "{}"'.format(cls, name))
+            rows = self.__db.execute('SELECT id, data FROM "{}"'.format(cls))
+            self.__db.executemany(
+                'UPDATE "{}" SET "{}" = ? WHERE id = ?'.format(cls, name),
+                [(self.__column(obj, name), obj.id)
+                 for obj in self.__build(cls, rows).values()])
+        self.__db.execute(
+            'CREATE INDEX IF NOT EXISTS "{0}_{1}" ON "{0}" ("{1}")'.format(
+                cls, name))
+        columns.append(name)
+
+    def add_range_index(self, cls, name):
+        """Maintain an indexed column for the attribute name of cls."""
+        self.add_index(cls, name)
+
+    def query_range(self, cls, name, low=None, high=None, limit=None,
+                    cursor=None, reverse=False):
+        """Return the objects of cls whose attribute name is in a range.
+
+        Same contract as FileStorage.query_range(); the rows are read
+        in order from the index of the column, and only numeric values
+        are considered.
+        """
+        cls = self.__class_name(cls)
+        self.add_range_index(cls, name)
+        self.__flush()
+        where = ["typeof(\"{}\") IN ('integer', 'real')".format(name)]
+        args = []
+        if low is not None:
+            where.append('"{}" >= ?'.format(name))
+            args.append(low)
+        if high is not None:
+            where.append('"{}" <= ?'.format(name))
+            args.append(high)
+        if cursor is not None:
+            where.append('("{}", id) {} (?, ?)'.format(
+                name, "<" if reverse else ">"))
+            args.extend([cursor[0], cursor[1].split(".", 1)[1]])
+        order = " DESC" if reverse else ""
+        sql = 'SELECT id, data FROM "{}" WHERE {} ORDER BY "{}"{}, id{}'
+        sql = sql.format(cls, " AND ".join(where), name, order, order)
+        if limit is not None:
+            sql += " LIMIT {:d}".format(limit + 1)
+        objects = self.__build(cls, self.__db.execute(sql, args))
+        if limit is None or len(objects) <= limit:
+            return objects, None
+        objects.popitem()
+        if not objects:
+            return objects, None
+        key = next(reversed(objects))
+        return objects, (getattr(objects[key], name), key)
+
+    def add_text_index(self, cls, *names):
+        """Maintain the full-text index of cls over the attributes names.
+
+        The text is kept in an FTS5 table, `<class name>_text`, whose
+        rowids are those of the rows of the class.
+        """
+        cls = self.__class_name(cls)
+        if self.__text.get(cls) == names:
+            return
+        self.__flush()
+        self.__db.execute('DROP TABLE IF EXISTS "{}_text"'.format(cls))
+        self.__text[cls] = names
+        self.__create_text_table(cls, names)
+
+    def __create_text_table(self, cls, names):
+        """Create the FTS5 table of cls, filling it if it is new."""
+        exists = self.__db.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?",
+            ("{}_text".format(cls),)).fetchone()
+        if exists:
+            return
+        self.__db.execute(
+            'CREATE VIRTUAL TABLE "{}_text" USING fts5(body)'.format(cls))
+        rows = self.__db.execute(
+            'SELECT rowid, data FROM "{}"'.format(cls)).fetchall()
+        self.__db.executemany(
+            'INSERT INTO "{}_text" (rowid, body) VALUES (?, ?)'.format(cls),
+            [(rowid, self.__body(json.loads(data), names))
+             for rowid, data in rows])
+
+    def search(self, cls, text, limit=10):
+        """Return the objects of cls best matching the words of text.
+
+        Same contract as FileStorage.search(), ranked by the bm25()
+        function of FTS5.
+        """
+        cls = self.__class_name(cls)
+        words = tokenize(text)
+        if cls not in self.__text or not words:
+            return {}
+        self.__flush()
+        sql = ('SELECT c.id, c.data FROM "{0}_text" t JOIN "{0}" c '
+               'ON c.rowid = t.rowid WHERE "{0}_text" MATCH ? '
+               'ORDER BY bm25("{0}_text"), c.id'.format(cls))
+        if limit is not None:
+            sql += " LIMIT {:d}".format(limit)
+        match = " OR ".join('"{}"'.format(word) for word in set(words))
+        return self.__build(cls, self.__db.execute(sql, (match,)))
+
+    @staticmethod
+    def __body(value, names):
+        """Return the indexed text of a to_dict() dictionary."""
+        return " ".join(value[name] for name in names
+                        if isinstance(value.get(name), str))
+
+    def add_inverted_index(self, cls, name):
+        """Accepted for compatibility; query_members() reads the JSON."""
+
+    def query_members(self, cls, name, all_of=(), any_of=()):
+        """Return the objects of cls by the members of their list name.
+
+        Same contract as FileStorage.query_members(); the lists are
+        read from the stored JSON with json_each(), which scans the
+        table.
+        """
+        cls = self.__class_name(cls)
+        self.__flush()
+        if not all_of and not any_of:
+            return {}
+        path = '$."{}"'.format(name)
+        where = ["json_type(data, ?) = 'array'"]
+        args = [path]
+        members = "SELECT value FROM json_each(data, ?) WHERE value IN ({})"
+        if all_of:
+            all_of = sorted(set(all_of))
+            where.append("(SELECT COUNT(DISTINCT value) FROM ({})) = ?".format(
+                members.format(", ".join("?" * len(all_of)))))
+            args.extend([path] + all_of + [len(all_of)])
+        if any_of:
+            any_of = sorted(set(any_of))
+            where.append("EXISTS ({})".format(
+                members.format(", ".join("?" * len(any_of)))))
+            args.extend([path] + any_of)
+        rows = self.__db.execute('SELECT id, data FROM "{}" WHERE {}'.format(
+            cls, " AND ".join(where)), args)
+        return self.__build(cls, rows)
+
+    def add_spatial_index(self, cls, latitude="latitude",
+                          longitude="longitude"):
+        """Maintain indexed columns for the coordinates of cls."""
+        self.add_index(cls, latitude)
+        self.add_index(cls, longitude)
+
+    def near(self, cls, latitude, longitude, radius):
+        """Return the objects of cls within radius km of a point.
+
+        Same contract as FileStorage.near(): the rows of the bounding
+        box of the circle are read, then ordered by distance.
+        """
+        found = []
+        for key, obj in self.__box(
+                cls, *bounds(latitude, longitude, radius)).items():
+            d = distance(latitude, longitude, obj.latitude, obj.longitude)
+            if d <= radius:
+                found.append((d, key, obj))
+        found.sort(key=lambda item: item[:2])
+        return {key: obj for _, key, obj in found}
+
+    def within(self, cls, south, west, north, east):
+        """Return the objects of cls in a latitude/longitude box.
+
+        Same contract as FileStorage.within().
+        """
+        latitude, longitude = center(south, west, north, east)
+        found = self.__box(cls, south, west, north, east)
+        return {key: found[key] for key in sorted(
+            found, key=lambda key: distance(
+                latitude, longitude, found[key].latitude,
+                found[key].longitude))}
+
+    def __box(self, cls, south, west, north, east):
+        """Return {key: instance} of the objects of cls in a box."""
+        cls = self.__class_name(cls)
+        self.add_spatial_index(cls)
+        self.__flush()
+        if west <= east:
+            where = "longitude BETWEEN ? AND ?"
+        else:
+            where = "(longitude >= ? OR longitude <= ?)"
+        rows = self.__db.execute(
+            'SELECT id, data FROM "{}" WHERE latitude BETWEEN ? AND ? '
+            'AND {}'.format(cls, where), (south, north, west, east))
+        return self.__build(cls, rows)
+
+    def new(self, obj):
+        """Add a new instance to the storage."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        self.__remember(key, obj)
+        self.__objects[key] = obj
+        self.__pending[key] = obj
+
+    def touch(self, obj, name):
+        """Mark obj dirty after its attribute name was set.
+
+        Objects that are not in the storage are ignored.
+        """
+        cls = obj.__class__.__name__
+        key = "{}.{}".format(cls, getattr(obj, "id", None))
+        if self.__objects.get(key) is obj:
+            self.__remember(key, obj)
+            self.__pending[key] = obj
+
+    def delete(self, obj):
+        """Remove an instance from the storage."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        self.__remember(key, obj)
+        self.__objects.pop(key, None)
+        self.__pending[key] = None
+
+    def save(self):
+        """Write and commit every change made since the last save."""
+        if self.__undo is not None:
+            return
+        self.__flush()
+        self.__db.commit()
+
+    @contextmanager
+    def batch(self):
+        """Group the changes made in the block into a single commit.
+
+        Same contract as FileStorage.batch(): if the block raises, the
+        transaction is rolled back and the objects it changed are
+        restored from the database.
+        """
+        if self.__undo is not None:
+            yield self
+            return
+        self.save()
+        self.__undo = {}
+        try:
+            yield self
+        except BaseException:
+            self.__rollback()
+            raise
+        finally:
+            self.__undo = None
+        self.save()
+
+    def __remember(self, key, obj):
+        """Record obj as changed by the current batch."""
+        if self.__undo is not None:
+            self.__undo.setdefault(key, obj)
+
+    def __rollback(self):
+        """Undo the current transaction and restore the changed objects."""
+        self.__pending.clear()
+        self.__db.rollback()
+        for key, obj in self.__undo.items():
+            self.__objects.pop(key, None)
+            cls, id = key.split(".", 1)
+            row = self.__db.execute(
+                'SELECT data FROM "{}" WHERE id = ?'.format(cls),
+                (id,)).fetchone()
+            if row is None:
+                continue
+            value = json.loads(row[0])
+            saved = self.classes()[cls].from_dict(value)
+            obj.__dict__.clear()
+            obj.__dict__.update(saved.__dict__)
+            self.__objects[key] = obj
+
+    def __flush(self):
+        """Write the pending changes to the current transaction."""
+        if not self.__pending:
+            return
+        puts = {}
+        deletes = {}
+        for key, obj in self.__pending.items():
+            cls, id = key.split(".", 1)
+            if obj is None:
+                deletes.setdefault(cls, []).append((id,))
+            else:
+                puts.setdefault(cls, []).append(obj)
+        self.__pending = {}
+        for cls in self.__text:
+            ids = deletes.get(cls, []) + [(obj.id,) for obj in
+                                          puts.get(cls, [])]
+            self.__db.executemany(
+                'DELETE FROM "{0}_text" WHERE rowid IN '
+                '(SELECT rowid FROM "{0}" WHERE id = ?)'.format(cls), ids)
+        for cls, ids in deletes.items():
+            self.__db.executemany(
+                'DELETE FROM "{}" WHERE id = ?'.format(cls), ids)
+        for cls, objs in puts.items():
+            columns = self.__columns[cls]
+            self.__db.executemany(
+                'INSERT OR REPLACE INTO "{}" (id, data{}) VALUES '
+                '(?, ?{})'.format(
+                    cls, "".join(', "{}"'.format(c) for c in columns),
+                    ", ?" * len(columns)),
+                [[obj.id, json.dumps(obj.to_dict(),
+                                     default=self.json_serializable)] +
+                 [self.__column(obj, c) for c in columns] for obj in objs])
+            if cls in self.__text:
+                self.__db.executemany(
+                    'INSERT INTO "{0}_text" (rowid, body) SELECT rowid, ? '
+                    'FROM "{0}" WHERE id = ?'.format(cls),
+                    [(self.__body(obj.__dict__, self.__text[cls]), obj.id)
+                     for obj in objs])
+
+    def __build(self, cls, rows):
+        """Return {key: instance} for (id, data) rows of cls."""
+        objects = {}
+        model = self.classes()[cls]
+        for id, data in rows:
+            key = "{}.{}".format(cls, id)
+            obj = self.__objects.get(key)
+            if obj is None:
+                obj = model.from_dict(json.loads(data))
+                self.__objects[key] = obj
+            objects[key] = obj
+        return objects
+
+    @staticmethod
+    def __column(obj, name):
+        """Return the value of the indexed column name for obj."""
+        value = getattr(obj, name, None)
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+        return None
+
+    @staticmethod
+    def __class_name(cls):
+        """Return the name of cls, which may be a class or a string."""
+        return cls if isinstance(cls, str) else cls.__name__
+
+    def json_serializable(self, obj):
+        """Handle serialization of non-serializable objects."""
+        return FileStorage.json_serializable(self, obj)
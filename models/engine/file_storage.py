@@ -1,26 +1,1080 @@
 #!/usr/bin/python3
+from bisect import bisect_right
+from contextlib import ExitStack, contextmanager, nullcontext
 from datetime import datetime
+import functools
+import itertools
 import json
+import os
+import threading
+from models.engine.aio import AsyncStorage
+from models.engine import binary as binary_format
+from models.engine.columns import Columns
+from models.engine.indexes import (GridIndex, HashIndex, InvertedIndex,
+                                   SortedIndex, TextIndex, center,
+                                   distance)
+from models.engine.journal import Journal
+from models.engine import snapshot
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 
-class FileStorage:
-    """ storage class"""
-    def __init__(self):
-        self.__file_path = 'file.json'
+class _Shard:
+    """The files persisting one part of a FileStorage.
+
+    Attributes:
+        path (str): path of the snapshot.
+        journal (Journal): the journal of the snapshot, or None.
+        opened (bool): whether the files were read since the last reload.
+        stat (tuple): the version of the snapshot last read or written,
+            see version().
+    """
+
+    def __init__(self, path, journal=False, fsync_interval=None,
+                 multiprocess=False):
+        """Initialize the shard stored at path."""
+        self.path = path
+        self.journal = None
+        if journal:
+            self.journal = Journal(path + ".log", fsync_interval)
+        self.opened = False
+        self.stat = None
+        self.__multiprocess = multiprocess and fcntl is not None
+        self.__lock_file = None
+        self.__depth = 0
+
+    def version(self):
+        """Return (inode, mtime, size) of the snapshot, or None.
+
+        The snapshot is always replaced by a rename, so any write
+        changes the version.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def journal_size(self):
+        """Return the size of the journal on disk."""
+        try:
+            return os.path.getsize(self.journal.path)
+        except FileNotFoundError:
+            return 0
+
+    @contextmanager
+    def locked(self, exclusive=False):
+        """Hold `<path>.lock`, shared or exclusive, in multiprocess mode.
+
+        The lock is an fcntl.flock() on a file of its own, since the
+        snapshot is replaced on every write. Nested blocks join the
+        outermost one.
+        """
+        if self.__multiprocess and self.__depth == 0:
+            if self.__lock_file is None:
+                self.__lock_file = open(self.path + ".lock", "a")
+            fcntl.flock(self.__lock_file.fileno(),
+                        fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self.__depth += 1
+        try:
+            yield self
+        finally:
+            self.__depth -= 1
+            if self.__multiprocess and self.__depth == 0:
+                fcntl.flock(self.__lock_file.fileno(), fcntl.LOCK_UN)
+
+
+_SYNCHRONIZED = ("all", "get", "count", "query", "add_index",
+                 "add_spatial_index", "add_range_index", "add_inverted_index",
+                 "add_text_index", "near", "within", "query_range",
+                 "query_members", "search", "columns", "new", "touch",
+                 "delete")
+
+
+def _synchronized(lock, method):
+    """Return method made to run holding lock."""
+    @functools.wraps(method)
+    def synchronized(*args, **kwargs):
+        with lock:
+            return method(*args, **kwargs)
+    return synchronized
+
+
+class FileStorage(AsyncStorage):
+    """ storage class
+
+    The store holds live model instances. Next to each one it keeps the
+    JSON text the instance was last loaded from or saved as. new(), and
+    touch() which BaseModel calls whenever one of its attributes is
+    set, mark the object dirty and drop that text, so a save only
+    encodes the dirty objects, and does nothing at all when none is.
+
+    In the default mode every save() rewrites the whole JSON file.
+    In journaled mode save() only appends one record per created,
+    updated or deleted object to `<file_path>.log`, and the log is
+    folded back into the JSON snapshot once it holds more than
+    `compact_threshold` records.
+
+    Objects are also bucketed per class, and the attributes listed in
+    `indexes` (class name -> attribute names) get a hash index, so
+    all(cls) and query() only touch the matching objects. Sorted
+    indexes serve query_range() and a grid index on Place coordinates
+    serves near() and within(); inverted indexes on list attributes
+    such as Place.amenity_ids serve query_members(), and text indexes
+    serve search(). columns()
+    gives a columnar view of a class for filters and aggregates.
+
+    The JSON file is always replaced atomically, through a temporary file
+    renamed over it. With `fsync_interval` set, snapshots are fsynced
+    and journal appends are fsynced at most once per interval (sync()
+    flushes the rest), so saving often costs neither corruption risk
+    nor one fsync per save.
+
+    With `binary` set, snapshots are written in the compact format of
+    models.engine.binary instead of JSON. reload() recognizes either
+    format, so a store can be converted by reloading it in one mode and
+    saving it in the other.
+
+    Inside a batch() block save() does nothing; the changes are written
+    once when the block exits, or undone if it raises.
+
+    With `threadsafe` set, the store can be shared between threads:
+    every method holds `lock`, a reentrant lock, while it reads or
+    changes the objects, and callers can hold it themselves around a
+    sequence of calls. save() only holds it to collect what to write:
+    the files are written after it is released, so other threads keep
+    reading and changing the store meanwhile, while saves run one at a
+    time. all() then returns a copy of the store rather than the store
+    itself. The asyncio methods of AsyncStorage, asave(), aget(),
+    aiter()..., need a thread-safe store.
+
+    With `write_behind` set to a number of seconds, save() does not
+    write anything: a background thread saves the pending changes
+    every write_behind seconds, or as soon as `write_behind_size` of
+    them are pending. flush() writes them at once; close() does too,
+    and stops the thread, and one of them must be called before
+    exiting. A background save that fails is retried, and its error is
+    raised by the next save(). A write-behind store is thread-safe.
+
+    With `multiprocess` set, several processes can share the files.
+    Each shard is read under a shared fcntl lock and written under an
+    exclusive one, and remembers the version of the files it last read
+    or wrote. refresh() compares that version with the files, which
+    only costs a stat() per shard, and takes in what other processes
+    saved: the new journal records when only the journal grew, or
+    else every entry that differs from what the store holds. Changes
+    not saved yet win over the saved ones, and save() refreshes the
+    store before writing, so no process overwrites the changes of
+    another with a stale copy.
+
+    In lazy mode reload() only records where each entry of the JSON
+    file starts; an entry is decoded the first time it is reached
+    through get(), all(), query() or add_index().
+
+    With `sharded` set, each class is persisted to its own
+    `<class name><extension of file_path>` file (User.json, Place.json,
+    ...) in the directory of file_path, with its own journal. A save
+    only writes the shards of the dirty objects, and reload() reads
+    nothing: a shard is read the first time its class is reached.
+    """
+    default_indexes = {
+        "City": ("state_id",),
+        "Place": ("city_id", "user_id"),
+        "Review": ("place_id", "user_id"),
+    }
+    default_spatial_indexes = {
+        "Place": ("latitude", "longitude"),
+    }
+    default_range_indexes = {
+        "Place": ("price_by_night", "max_guest"),
+    }
+    default_inverted_indexes = {
+        "Place": ("amenity_ids",),
+    }
+    default_text_indexes = {
+        "Place": ("name", "description"),
+        "Review": ("text",),
+    }
+
+    def __init__(self, file_path='file.json', journal=False,
+                 compact_threshold=1000, indexes=None, lazy=False,
+                 fsync_interval=None, binary=False, sharded=False,
+                 threadsafe=False, write_behind=None,
+                 write_behind_size=1000, multiprocess=False):
+        threadsafe = threadsafe or write_behind is not None
+        self.lock = threading.RLock() if threadsafe else nullcontext()
+        self.__save_lock = threading.RLock() if threadsafe else nullcontext()
+        self.threadsafe = threadsafe
+        self.__write_behind = write_behind
+        self.__multiprocess = multiprocess
+        self.__write_behind_size = write_behind_size
+        self.__wake = threading.Event()
+        self.__worker = None
+        self.__stop = None
+        self.__error = None
+        if threadsafe:
+            for name in _SYNCHRONIZED:
+                setattr(self, name, _synchronized(self.lock,
+                                                  getattr(self, name)))
+        self.__file_path = file_path
+        self.__binary = binary
+        self.__sharded = sharded
+        self.__shards = {}
+        self.__journaled = journal
+        self.__fsync_interval = fsync_interval
+        self.__lazy = lazy
+        self.__unloaded = {}
         self.__objects = {}
+        self.__encoded = {}
+        self.__classes = {}
+        self.__indexes = {}
+        self.__columns = {}
+        self.__pending = {}
+        self.__undo = None
+        self.__compact_threshold = compact_threshold
+        if indexes is None:
+            indexes = self.default_indexes
+        for cls, names in indexes.items():
+            for name in names:
+                self.add_index(cls, name)
+        for cls, names in self.default_spatial_indexes.items():
+            self.add_spatial_index(cls, *names)
+        for cls, names in self.default_range_indexes.items():
+            for name in names:
+                self.add_range_index(cls, name)
+        for cls, names in self.default_inverted_indexes.items():
+            for name in names:
+                self.add_inverted_index(cls, name)
+        for cls, names in self.default_text_indexes.items():
+            self.add_text_index(cls, *names)
 
-    def all(self):
-        return self.__objects
+    def all(self, cls=None):
+        """Return the stored objects, optionally only those of cls."""
+        if cls is None:
+            self.__open()
+            self.__load()
+            if self.threadsafe:
+                return dict(self.__objects)
+            return self.__objects
+        cls = self.__class_name(cls)
+        self.__open(cls)
+        self.__load(cls)
+        return dict(self.__classes.get(cls, {}))
+
+    def iterate(self, cls, after=None):
+        """Yield the objects of cls in id order, from the id after after.
+
+        Lazily loaded entries are decoded one at a time as they are
+        reached, so walking the store does not build a dictionary of
+        every object of cls.
+        """
+        cls = self.__class_name(cls)
+        with self.lock:
+            self.__open(cls)
+            keys = sorted(itertools.chain(self.__classes.get(cls, ()),
+                                          self.__unloaded.get(cls, ())))
+        start = 0
+        if after is not None:
+            start = bisect_right(keys, "{}.{}".format(cls, after))
+        for key in itertools.islice(keys, start, None):
+            with self.lock:
+                self.__load(key=key)
+                obj = self.__objects.get(key)
+            if obj is not None:
+                yield obj
+
+    def get(self, cls, id):
+        """Return the object of cls with the given id, or None."""
+        cls = self.__class_name(cls)
+        self.__open(cls)
+        key = "{}.{}".format(cls, id)
+        self.__load(key=key)
+        return self.__objects.get(key)
+
+    def count(self, cls=None):
+        """Return the number of stored objects, optionally of cls."""
+        if cls is None:
+            self.__open()
+            return len(self.__objects) + sum(
+                len(offsets) for offsets in self.__unloaded.values())
+        cls = self.__class_name(cls)
+        self.__open(cls)
+        return (len(self.__classes.get(cls, {})) +
+                len(self.__unloaded.get(cls, {})))
+
+    def query(self, cls, **attrs):
+        """Return the objects of cls whose attributes equal attrs.
+
+        Indexed attributes are resolved through their hash index; the
+        others are checked on the candidates that remain.
+        """
+        name = self.__class_name(cls)
+        self.__open(name)
+        self.__load(name)
+        bucket = self.__classes.get(name, {})
+        indexes = self.__indexes.get(name, {})
+        keys = None
+        for attr, value in attrs.items():
+            if attr in indexes:
+                found = indexes[attr].find(value)
+                keys = found if keys is None else keys & found
+        if keys is None:
+            keys = bucket
+        return {key: bucket[key] for key in keys
+                if all(getattr(bucket[key], attr, None) == value
+                       for attr, value in attrs.items())}
+
+    def add_index(self, cls, name):
+        """Maintain a hash index on the attribute name of cls."""
+        self.__add_index(cls, name, lambda: HashIndex(name))
+
+    def add_spatial_index(self, cls, latitude="latitude",
+                          longitude="longitude"):
+        """Maintain a grid index on the coordinates of cls."""
+        names = (latitude, longitude)
+        self.__add_index(cls, names, lambda: GridIndex(names))
+
+    def add_range_index(self, cls, name):
+        """Maintain a sorted index on the numeric attribute name of cls."""
+        self.__range_index(self.__class_name(cls), name)
+
+    def add_inverted_index(self, cls, name):
+        """Maintain an inverted index on the list attribute name of cls."""
+        self.__inverted_index(self.__class_name(cls), name)
+
+    def add_text_index(self, cls, *names):
+        """Maintain the full-text index of cls over the attributes names.
+
+        A class has a single text index; it is replaced when names
+        differ.
+        """
+        cls = self.__class_name(cls)
+        index = self.__indexes.get(cls, {}).get(("text",))
+        if index is not None and index.names != names:
+            del self.__indexes[cls][("text",)]
+        self.__add_index(cls, ("text",), lambda: TextIndex(names))
+
+    def __add_index(self, cls, name, factory):
+        """Maintain the index factory() as name on cls, unless one is."""
+        cls = self.__class_name(cls)
+        indexes = self.__indexes.setdefault(cls, {})
+        if name in indexes:
+            return indexes[name]
+        index = indexes[name] = factory()
+        self.__load(cls)
+        for key, obj in self.__classes.get(cls, {}).items():
+            index.add(key, obj)
+        return index
+
+    def near(self, cls, latitude, longitude, radius):
+        """Return the objects of cls within radius km of a point.
+
+        Objects are ordered nearest first. The coordinates are read
+        from the latitude and longitude attributes.
+        """
+        cls = self.__class_name(cls)
+        index = self.__spatial_index(cls)
+        return {key: self.__objects[key]
+                for _, key in index.near(latitude, longitude, radius)}
+
+    def within(self, cls, south, west, north, east):
+        """Return the objects of cls in a latitude/longitude box.
+
+        Objects are ordered by distance to the center of the box; a box
+        with west > east crosses the antimeridian.
+        """
+        cls = self.__class_name(cls)
+        index = self.__spatial_index(cls)
+        latitude, longitude = center(south, west, north, east)
+        points = index.box(south, west, north, east)
+        return {key: self.__objects[key] for key in sorted(
+            points, key=lambda key: distance(latitude, longitude,
+                                             *points[key]))}
+
+    def __spatial_index(self, cls):
+        """Return the grid index of cls, loading its objects."""
+        self.__open(cls)
+        self.__load(cls)
+        names = ("latitude", "longitude")
+        return self.__add_index(cls, names, lambda: GridIndex(names))
+
+    def query_range(self, cls, name, low=None, high=None, limit=None,
+                    cursor=None, reverse=False):
+        """Return the objects of cls whose attribute name is in a range.
+
+        Objects are ordered by the value of name, and only those
+        between low and high (inclusive, when given) are returned, at
+        most limit of them. Returns (objects, cursor): passing cursor
+        back returns the next page, and it is None after the last one.
+        """
+        cls = self.__class_name(cls)
+        self.__open(cls)
+        self.__load(cls)
+        keys, cursor = self.__range_index(cls, name).range(
+            low, high, limit, cursor, reverse)
+        return {key: self.__objects[key] for key in keys}, cursor
+
+    def query_members(self, cls, name, all_of=(), any_of=()):
+        """Return the objects of cls by the members of their list name.
+
+        An object is returned when its attribute name, e.g. the
+        amenity_ids of a Place, holds every value of all_of and, if
+        any_of is not empty, at least one value of any_of.
+        """
+        cls = self.__class_name(cls)
+        self.__open(cls)
+        self.__load(cls)
+        index = self.__inverted_index(cls, name)
+        if all_of:
+            keys = index.all_of(all_of)
+            if any_of:
+                some = set(index.any_of(any_of))
+                keys = [key for key in keys if key in some]
+        elif any_of:
+            keys = index.any_of(any_of)
+        else:
+            keys = []
+        return {key: self.__objects[key] for key in keys}
+
+    def search(self, cls, text, limit=10):
+        """Return the objects of cls best matching the words of text.
+
+        Objects are ranked with BM25 over the attributes of the text
+        index of cls, best first; at most limit of them are returned,
+        all of them with None. Classes without a text index match
+        nothing.
+        """
+        cls = self.__class_name(cls)
+        self.__open(cls)
+        self.__load(cls)
+        index = self.__indexes.get(cls, {}).get(("text",))
+        if index is None:
+            return {}
+        return {key: self.__objects[key]
+                for _, key in index.search(text, limit)}
+
+    def __inverted_index(self, cls, name):
+        """Return the inverted index on name of cls, adding it if needed."""
+        return self.__add_index(cls, ("inverted", name),
+                                lambda: InvertedIndex(name))
+
+    def __range_index(self, cls, name):
+        """Return the sorted index on name of cls, adding it if needed."""
+        return self.__add_index(cls, ("sorted", name),
+                                lambda: SortedIndex(name))
+
+    def columns(self, cls, names=None):
+        """Return the columnar view of cls, kept in sync with the store.
+
+        The view is built on the first call, holding the attributes
+        names (by default those chosen by Columns); later calls return
+        it as it is.
+        """
+        cls = self.__class_name(cls)
+        view = self.__columns.get(cls)
+        if view is None:
+            view = self.__columns[cls] = Columns(self.classes()[cls], names)
+            self.__open(cls)
+            self.__load(cls)
+            for key, obj in self.__classes.get(cls, {}).items():
+                view.add(key, obj)
+        return view
 
     def new(self, obj):
         """Add a new instance to the storage."""
+        self.__open(obj.__class__.__name__)
         key = "{}.{}".format(obj.__class__.__name__, obj.id)
-        self.__objects[key] = obj.to_dict()
+        self.__remember(key)
+        self.__link(key, obj)
+        self.__pending[key] = True
+
+    def touch(self, obj, name):
+        """Mark obj dirty after its attribute name was set.
+
+        Objects that are not in the storage are ignored.
+        """
+        cls = obj.__class__.__name__
+        key = "{}.{}".format(cls, getattr(obj, "id", None))
+        if self.__objects.get(key) is not obj:
+            return
+        self.__remember(key)
+        self.__encoded.pop(key, None)
+        self.__pending[key] = True
+        for index in self.__indexes.get(cls, {}).values():
+            if name in index.names:
+                index.add(key, obj)
+        view = self.__columns.get(cls)
+        if view is not None and name in view.names:
+            view.add(key, obj)
+
+    def delete(self, obj):
+        """Remove an instance from the storage."""
+        self.__open(obj.__class__.__name__)
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        self.__remember(key)
+        if self.__unlink(key) is not None:
+            self.__pending[key] = False
+
+    @contextmanager
+    def batch(self):
+        """Group the changes made in the block into a single write.
+
+        Pending changes are saved when the block is entered. save()
+        calls inside the block are deferred to its exit; if the block
+        raises, every object it created, changed or deleted is put back
+        as it was when the block was entered. Nested blocks join the
+        outermost one.
+        """
+        with self.__save_lock, self.lock:
+            if self.__undo is not None:
+                yield self
+                return
+            self.__save()
+            self.__undo = {}
+            try:
+                yield self
+            except BaseException:
+                self.__rollback()
+                raise
+            finally:
+                self.__undo = None
+            self.save()
+
+    def __remember(self, key):
+        """Record how key was stored before the current batch changed it."""
+        if self.__undo is None or key in self.__undo:
+            return
+        self.__load(key=key)
+        self.__undo[key] = (self.__objects.get(key), self.__encoded.get(key))
+
+    def __rollback(self):
+        """Put back every object changed by the current batch."""
+        classes = self.classes()
+        for key, (obj, encoded) in self.__undo.items():
+            self.__unlink(key)
+            self.__pending.pop(key, None)
+            if encoded is None:
+                continue
+            if isinstance(encoded, tuple):
+                value = binary_format.decode(encoded)
+            else:
+                value = json.loads(encoded)
+            saved = classes[value["__class__"]].from_dict(value)
+            obj.__dict__.clear()
+            obj.__dict__.update(saved.__dict__)
+            self.__link(key, obj)
+            self.__encoded[key] = encoded
+
+    def __link(self, key, obj):
+        """Store obj under key and add it to its bucket and indexes."""
+        cls = key.split(".")[0]
+        self.__unloaded.get(cls, {}).pop(key, None)
+        self.__encoded.pop(key, None)
+        self.__objects[key] = obj
+        self.__classes.setdefault(cls, {})[key] = obj
+        for index in self.__indexes.get(cls, {}).values():
+            index.add(key, obj)
+        if cls in self.__columns:
+            self.__columns[cls].add(key, obj)
+
+    def __unlink(self, key):
+        """Remove key from the store, its bucket and its indexes."""
+        self.__load(key=key)
+        obj = self.__objects.pop(key, None)
+        if obj is None:
+            return None
+        self.__encoded.pop(key, None)
+        cls = key.split(".")[0]
+        del self.__classes[cls][key]
+        for index in self.__indexes.get(cls, {}).values():
+            index.discard(key)
+        if cls in self.__columns:
+            self.__columns[cls].discard(key)
+        return obj
+
+    def __load(self, cls=None, key=None):
+        """Decode the snapshot entries of key, of cls, or all of them."""
+        if not self.__unloaded:
+            return
+        if key is not None:
+            cls = key.split(".")[0]
+            offsets = self.__unloaded.get(cls, {})
+            if key not in offsets:
+                return
+            wanted = {cls: {key: offsets.pop(key)}}
+        elif cls is not None:
+            wanted = {cls: self.__unloaded.pop(cls, {})}
+        else:
+            wanted = self.__unloaded
+            self.__unloaded = {}
+        for cls, offsets in wanted.items():
+            self.__decode(snapshot.load(self.__shard(cls).path, offsets))
+
+    def __shard(self, cls):
+        """Return the shard persisting the objects of the class cls."""
+        if not self.__sharded:
+            cls = None
+        shard = self.__shards.get(cls)
+        if shard is None:
+            path = self.__file_path
+            if cls is not None:
+                path = os.path.join(os.path.dirname(path),
+                                    cls + os.path.splitext(path)[1])
+            shard = self.__shards[cls] = _Shard(
+                path, self.__journaled, self.__fsync_interval,
+                self.__multiprocess)
+        return shard
+
+    def __open(self, cls=None):
+        """Read the shard of cls, or every shard, unless already read.
+
+        Only sharded stores are read on demand; the others are read
+        by reload().
+        """
+        if not self.__sharded:
+            return
+        for name in self.classes() if cls is None else (cls,):
+            shard = self.__shard(name)
+            if not shard.opened:
+                self.__read(shard)
+
+    def __read(self, shard):
+        """Decode the snapshot of shard, then replay its journal over it."""
+        with shard.locked():
+            self.__read_locked(shard)
+            shard.stat = shard.version()
+
+    def __read_locked(self, shard):
+        """Read shard, see __read(), holding its lock file."""
+        shard.opened = True
+        try:
+            if binary_format.is_binary(shard.path):
+                with open(shard.path, "rb") as f:
+                    f.seek(len(binary_format.MAGIC))
+                    self.__decode_records(binary_format.load(f))
+            else:
+                offsets = None
+                if self.__lazy:
+                    offsets = snapshot.scan(shard.path)
+                if offsets is None:
+                    self.__decode(snapshot.read(shard.path))
+                else:
+                    for key, offset in offsets.items():
+                        self.__unloaded.setdefault(
+                            key.split(".")[0], {})[key] = offset
+        except FileNotFoundError:
+            pass
+        if shard.journal is not None:
+            classes = self.classes()
+            for record in shard.journal.replay():
+                self.__unlink(record["key"])
+                if record["op"] == "put":
+                    value = record["value"]
+                    self.__link(record["key"], classes[
+                        value["__class__"]].from_dict(value))
+                    self.__encoded[record["key"]] = json.dumps(value)
+
+    def __decode(self, entries):
+        """Store instances built from (key, encoded value) pairs."""
+        classes = self.classes()
+        for key, encoded in entries:
+            value = json.loads(encoded)
+            self.__link(key, classes[value["__class__"]].from_dict(value))
+            self.__encoded[key] = encoded
+
+    def __decode_records(self, records):
+        """Store instances built from binary snapshot records."""
+        classes = self.classes()
+        for record in records:
+            value = binary_format.decode(record, datetimes=True)
+            key = "{}.{}".format(record[0], value["id"])
+            self.__link(key, classes[record[0]].from_dict(value))
+            self.__encoded[key] = record
+
+    def refresh(self):
+        """Take in the changes saved to the files by other processes.
+
+        Only shards read since the last reload are checked. Returns
+        True if anything changed on disk.
+        """
+        changed = False
+        with self.__save_lock:
+            for cls, shard in list(self.__shards.items()):
+                with shard.locked(), self.lock:
+                    changed = self.__refresh(cls, shard) or changed
+        return changed
+
+    def __refresh(self, cls, shard):
+        """Take in the changes saved to shard by other processes.
+
+        Must be called holding the lock file of shard. Returns True if
+        the files changed since the shard was last read or written.
+        """
+        if not shard.opened:
+            return False
+        journal = shard.journal
+        size = 0 if journal is None else shard.journal_size()
+        if shard.version() != shard.stat or \
+                journal is not None and size < journal.size:
+            self.__reread(cls, shard)
+        elif journal is not None and size > journal.size:
+            for record in journal.replay(journal.size):
+                value = record.get("value")
+                self.__merge(record["key"], None if value is None
+                             else json.dumps(value))
+        else:
+            return False
+        return True
+
+    def __reread(self, cls, shard):
+        """Merge the files of shard after another process rewrote them.
+
+        Entries equal to what the store holds are left alone, so their
+        instances stay the same. In lazy mode entries that were not
+        decoded yet are only located again.
+        """
+        fresh = {}
+        offsets = {}
+        try:
+            if binary_format.is_binary(shard.path):
+                with open(shard.path, "rb") as f:
+                    f.seek(len(binary_format.MAGIC))
+                    for record in binary_format.load(f):
+                        fresh[binary_format.key(record)] = record
+            else:
+                if self.__lazy:
+                    offsets = snapshot.scan(shard.path) or {}
+                if not offsets:
+                    fresh.update(snapshot.read(shard.path))
+        except FileNotFoundError:
+            pass
+        if shard.journal is not None:
+            for record in shard.journal.replay():
+                offsets.pop(record["key"], None)
+                value = record.get("value")
+                fresh[record["key"]] = (None if value is None
+                                        else json.dumps(value))
+        if cls is None:
+            held = list(self.__objects)
+            for entries in self.__unloaded.values():
+                held.extend(entries)
+        else:
+            held = list(self.__classes.get(cls, {}))
+            held.extend(self.__unloaded.get(cls, {}))
+        for key in held:
+            if key not in fresh and key not in offsets:
+                self.__merge(key, None)
+        wanted = {}
+        for key, offset in offsets.items():
+            if key in self.__objects:
+                wanted[key] = offset
+            elif key not in self.__pending:
+                self.__unloaded.setdefault(key.split(".")[0], {})[key] = offset
+        fresh.update(snapshot.load(shard.path, wanted))
+        for key, encoded in fresh.items():
+            self.__merge(key, encoded)
+        shard.stat = shard.version()
+
+    def __merge(self, key, encoded):
+        """Take in encoded, saved under key by another process.
+
+        encoded is the JSON text or binary record of the object, or
+        None if it was deleted. The instance held under key is updated
+        in place. Keys with changes not saved yet are left alone.
+        """
+        if key in self.__pending or (
+                encoded is not None and self.__encoded.get(key) == encoded):
+            return
+        self.__unloaded.get(key.split(".")[0], {}).pop(key, None)
+        if encoded is None:
+            self.__unlink(key)
+            return
+        if isinstance(encoded, tuple):
+            value = binary_format.decode(encoded, datetimes=True)
+        else:
+            value = json.loads(encoded)
+        obj = self.classes()[value["__class__"]].from_dict(value)
+        held = self.__objects.get(key)
+        if held is not None:
+            held.__dict__.clear()
+            held.__dict__.update(obj.__dict__)
+            obj = held
+        self.__link(key, obj)
+        self.__encoded[key] = encoded
+
+    def __encode(self, key):
+        """Return the JSON text of the object stored under key."""
+        encoded = self.__encoded.get(key)
+        if not isinstance(encoded, str):
+            encoded = json.dumps(self.__objects[key].to_dict(),
+                                 default=self.json_serializable)
+            self.__encoded[key] = encoded
+        return encoded
+
+    def __record(self, key):
+        """Return the binary record of the object stored under key."""
+        record = self.__encoded.get(key)
+        if not isinstance(record, tuple):
+            record = binary_format.encode(json.loads(self.__encode(key)))
+            self.__encoded[key] = record
+        return record
+
+    @staticmethod
+    def classes():
+        """Return the model classes by name."""
+        from models.base_model import BaseModel
+        from models.user import User
+        from models.state import State
+        from models.city import City
+        from models.place import Place
+        from models.amenity import Amenity
+        from models.review import Review
+        return {
+            "BaseModel": BaseModel,
+            "User": User,
+            "State": State,
+            "City": City,
+            "Place": Place,
+            "Amenity": Amenity,
+            "Review": Review,
+        }
+
+    @staticmethod
+    def __class_name(cls):
+        """Return the name of cls, which may be a class or a string."""
+        return cls if isinstance(cls, str) else cls.__name__
 
     def save(self):
-        """Serialize __objects to the JSON file."""
-        with open(self.__file_path, "w") as file:
-            json.dump(self.__objects, file, default=self.json_serializable)
+        """Persist every change made since the last save.
+
+        In write-behind mode the changes are left to the background
+        thread, which is started by the first save. The error of the
+        last background save, if it failed, is raised.
+        """
+        if self.__write_behind is None:
+            self.__save()
+            return
+        with self.lock:
+            error, self.__error = self.__error, None
+            if self.__worker is None:
+                self.__stop = threading.Event()
+                self.__worker = threading.Thread(
+                    target=self.__flush_behind, args=(self.__stop,),
+                    daemon=True, name="FileStorage write-behind")
+                self.__worker.start()
+            if len(self.__pending) >= self.__write_behind_size:
+                self.__wake.set()
+        if error is not None:
+            raise error
+
+    def flush(self):
+        """Write every pending change now, and fsync it with
+        fsync_interval set.
+        """
+        with self.lock:
+            self.__error = None
+        self.__save()
+        self.sync()
+
+    def close(self):
+        """Stop the write-behind thread, if any, then flush().
+
+        A later save() starts a new thread.
+        """
+        with self.lock:
+            worker, self.__worker = self.__worker, None
+            stop = self.__stop
+        if worker is not None:
+            stop.set()
+            self.__wake.set()
+            worker.join()
+        self.flush()
+
+    def __flush_behind(self, stop):
+        """Save the pending changes in the background until stop is set.
+
+        A save that fails leaves its changes pending, to be retried the
+        next time, and its error for save() to raise.
+        """
+        while True:
+            self.__wake.wait(self.__write_behind)
+            self.__wake.clear()
+            if stop.is_set():
+                return
+            try:
+                self.__save()
+            except Exception as error:
+                with self.lock:
+                    self.__error = error
+
+    def __save(self):
+        """Write every change made since the last save."""
+        with self.__save_lock:
+            with self.lock:
+                if self.__undo is not None:
+                    return
+                shards = {key.split(".")[0] if self.__sharded else None
+                          for key in self.__pending}
+                if not self.__sharded:
+                    shards.add(None)
+                shards = {cls: self.__shard(cls) for cls in shards}
+            with self.__locked(shards):
+                with self.lock:
+                    # A dict never shrinks on deletion, so the pending
+                    # changes are handed over by swapping in a new one.
+                    pending = self.__pending
+                    if self.__sharded:
+                        kept = {key: alive for key, alive in pending.items()
+                                if key.split(".")[0] not in shards}
+                        if kept:
+                            pending = {key: alive for key, alive
+                                       in pending.items() if key not in kept}
+                    else:
+                        kept = {}
+                    self.__pending = kept
+                    try:
+                        writes = self.__collect(pending)
+                    except BaseException:
+                        self.__restore(pending)
+                        raise
+                try:
+                    for write in writes:
+                        write()
+                except BaseException:
+                    with self.lock:
+                        self.__restore(pending)
+                    raise
+
+    @contextmanager
+    def __locked(self, shards):
+        """Hold the lock files of shards, {cls: shard}, exclusively.
+
+        In multiprocess mode the changes other processes saved to them
+        are then taken in, so that they are not overwritten.
+        """
+        with ExitStack() as stack:
+            for cls, shard in sorted(shards.items(),
+                                     key=lambda item: item[1].path):
+                stack.enter_context(shard.locked(exclusive=True))
+            if self.__multiprocess:
+                with self.lock:
+                    for cls, shard in shards.items():
+                        self.__refresh(cls, shard)
+            yield
+
+    def __collect(self, pending):
+        """Return the functions writing the changes of pending to disk.
+
+        Everything they write is gathered now, so that they can run
+        without holding lock.
+        """
+        dirty = {}
+        for key, alive in pending.items():
+            cls = key.split(".")[0] if self.__sharded else None
+            dirty.setdefault(cls, []).append((key, alive))
+        if not self.__sharded and not os.path.exists(self.__file_path):
+            dirty.setdefault(None, [])
+        writes = []
+        for cls, changes in dirty.items():
+            journal = self.__shard(cls).journal
+            if journal is None:
+                writes.append(self.__snapshot(cls))
+                continue
+            records = [(key, self.__encode(key) if alive else None)
+                       for key, alive in changes]
+            writes.append(functools.partial(journal.append, records))
+            if journal.count + len(records) >= self.__compact_threshold:
+                writes.append(self.__compaction(cls))
+        return writes
+
+    def __restore(self, pending):
+        """Mark the changes of pending, which failed to save, as pending.
+
+        Objects changed again since keep their newer state.
+        """
+        for key, alive in pending.items():
+            self.__pending.setdefault(key, alive)
+
+    def compact(self):
+        """Fold the journals into their snapshots and empty them."""
+        with self.__save_lock:
+            with self.lock:
+                shards = {cls: shard
+                          for cls, shard in list(self.__shards.items())
+                          if cls is None or shard.opened and (
+                              cls in self.__classes or
+                              os.path.exists(shard.path))}
+            with self.__locked(shards):
+                with self.lock:
+                    writes = [self.__compaction(cls) for cls in shards]
+                for write in writes:
+                    write()
+
+    def __compaction(self, cls):
+        """Return a function folding the journal of cls into its snapshot."""
+        write = self.__snapshot(cls)
+        journal = self.__shard(cls).journal
+
+        def compact():
+            write()
+            if journal is not None:
+                journal.truncate()
+        return compact
+
+    def sync(self):
+        """fsync the journal records not flushed to disk yet."""
+        with self.__save_lock:
+            for shard in list(self.__shards.values()):
+                if shard.journal is not None:
+                    shard.journal.sync()
+
+    def __snapshot(self, cls=None):
+        """Return a function writing the objects of cls to its snapshot.
+
+        cls is None when the store is not sharded. The entries are
+        gathered now; the function writes them, then holds lock while
+        the new file replaces the old one. JSON snapshots hold one entry
+        per line. Entries not decoded yet are copied from the old file
+        as they are, and their offsets moved to the new one.
+        """
+        shard = self.__shard(cls)
+        path = shard.path
+        fsync = self.__fsync_interval is not None
+        if cls is None:
+            keys = self.__objects
+            unloaded = list(self.__unloaded.values())
+        else:
+            keys = self.__classes.get(cls, {})
+            unloaded = [self.__unloaded.get(cls, {})]
+        if self.__binary:
+            self.__load(cls)
+            records = [self.__record(key) for key in keys]
+
+            def write():
+                snapshot.stage(path, lambda file: binary_format.dump(
+                    file, records), fsync=fsync, mode="wb")
+                with self.lock:
+                    snapshot.commit(path, fsync)
+                    shard.stat = shard.version()
+            return write
+        entries = [(key, self.__encode(key)) for key in keys]
+        wanted = {}
+        for offsets in unloaded:
+            wanted.update(offsets)
+
+        def write():
+            offsets = snapshot.stage(path, lambda file: snapshot.dump(
+                file, itertools.chain(entries, snapshot.load(path, wanted))),
+                fsync=fsync)
+            with self.lock:
+                snapshot.commit(path, fsync)
+                shard.stat = shard.version()
+                for unloaded_entries in unloaded:
+                    for key in unloaded_entries:
+                        unloaded_entries[key] = offsets[key]
+        return write
 
     def json_serializable(self, obj):
         """Handle serialization of non-serializable objects."""
@@ -29,11 +1083,28 @@ class FileStorage:
         raise TypeError(f"Type {type(obj)} not serializable")
 
     def reload(self):
-        """Deserialize the JSON file to objects."""
-        try:
-            with open(self.__file_path, 'r') as f:
-                data = json.load(f)
-                self.__objects = data
-                return data
-        except FileNotFoundError:
-            pass
+        """Deserialize the snapshot, then replay the journal over it.
+
+        Sharded stores are only emptied; their shards are read on
+        demand.
+        """
+        with self.__save_lock, self.lock:
+            return self.__reload()
+
+    def __reload(self):
+        """Reset the store and read it again, see reload()."""
+        self.__objects = {}
+        self.__encoded = {}
+        self.__classes = {}
+        self.__unloaded = {}
+        for indexes in self.__indexes.values():
+            for index in indexes.values():
+                index.clear()
+        for view in self.__columns.values():
+            view.clear()
+        for shard in self.__shards.values():
+            shard.opened = False
+        if not self.__sharded:
+            self.__read(self.__shard(None))
+        self.__pending.clear()
+        return self.__objects
@@ -0,0 +1,508 @@
+#!/usr/bin/python3
+"""Defines the secondary indexes maintained by FileStorage.
+
+An index is told about every object of its class through add() and
+discard(); touch() calls add() again when one of the attributes listed
+in its `names` is set.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+import heapq
+import math
+import re
+
+EARTH_RADIUS = 6371.0088
+
+_WORD = re.compile(r"\w+")
+
+
+class HashIndex:
+    """Map the values of one attribute to the keys holding them.
+
+    The index remembers the value it saw for every key, so an entry
+    can be dropped even after the object itself has changed.
+
+    Attributes:
+        name (str): the indexed attribute.
+        names (tuple): (name,).
+    """
+
+    def __init__(self, name):
+        """Initialize an empty index on the attribute name."""
+        self.name = name
+        self.names = (name,)
+        self.__keys = {}
+        self.__values = {}
+
+    def add(self, key, obj):
+        """Index obj under key, replacing any previous entry."""
+        self.discard(key)
+        value = getattr(obj, self.name, None)
+        try:
+            self.__keys.setdefault(value, set()).add(key)
+        except TypeError:
+            return
+        self.__values[key] = value
+
+    def discard(self, key):
+        """Drop the entry of key, if any."""
+        if key not in self.__values:
+            return
+        value = self.__values.pop(key)
+        keys = self.__keys[value]
+        keys.discard(key)
+        if not keys:
+            del self.__keys[value]
+
+    def find(self, value):
+        """Return the set of keys whose attribute equals value."""
+        try:
+            return self.__keys.get(value, set())
+        except TypeError:
+            return set()
+
+    def clear(self):
+        """Drop every entry."""
+        self.__keys.clear()
+        self.__values.clear()
+
+
+class SortedIndex:
+    """Keep the keys ordered by the numeric value of one attribute.
+
+    Values and keys are kept in two parallel lists sorted by
+    (value, key), so a range is located with bisect and read as a
+    slice. Entries added since the last query are sorted in on the
+    next one, which keeps bulk loads linear. Values that are not
+    numbers are left out.
+
+    Attributes:
+        name (str): the indexed attribute.
+        names (tuple): (name,).
+    """
+
+    def __init__(self, name):
+        """Initialize an empty index on the attribute name."""
+        self.name = name
+        self.names = (name,)
+        self.__values = array("d")
+        self.__keys = []
+        self.__of = {}
+        self.__pending = []
+
+    def __len__(self):
+        """Return the number of keys indexed."""
+        return len(self.__of)
+
+    def add(self, key, obj):
+        """Index obj under key, replacing any previous entry."""
+        self.discard(key)
+        try:
+            value = float(getattr(obj, self.name, None))
+        except (TypeError, ValueError):
+            return
+        if math.isnan(value):
+            return
+        self.__of[key] = value
+        self.__pending.append((value, key))
+
+    def discard(self, key):
+        """Drop the entry of key, if any."""
+        value = self.__of.pop(key, None)
+        if value is None:
+            return
+        self.__sort()
+        position = self.__position(value, key)
+        del self.__values[position]
+        del self.__keys[position]
+
+    def clear(self):
+        """Drop every entry."""
+        del self.__values[:]
+        self.__keys.clear()
+        self.__of.clear()
+        self.__pending.clear()
+
+    def range(self, low=None, high=None, limit=None, cursor=None,
+              reverse=False):
+        """Return the keys whose value is in [low, high], in order.
+
+        At most limit keys are returned, from the smallest value, or
+        the largest one with reverse. Returns (keys, cursor): passing
+        cursor back returns the next page, and it is None after the
+        last one.
+        """
+        self.__sort()
+        values = self.__values
+        start = 0 if low is None else bisect_left(values, low)
+        end = len(values) if high is None else bisect_right(values, high)
+        if cursor is not None:
+            position = self.__position(*cursor)
+            if reverse:
+                end = min(end, position)
+            else:
+                if position < len(values) and \
+                        (values[position], self.__keys[position]) == cursor:
+                    position += 1
+                start = max(start, position)
+        if limit is None or limit >= end - start:
+            first, last = start, end
+        elif reverse:
+            first, last = end - limit, end
+        else:
+            first, last = start, start + limit
+        keys = self.__keys[first:last]
+        if reverse:
+            keys.reverse()
+        if not keys or (first, last) == (start, end):
+            return keys, None
+        edge = first if reverse else last - 1
+        return keys, (values[edge], self.__keys[edge])
+
+    def __position(self, value, key):
+        """Return where (value, key) is or would be in the lists."""
+        low = bisect_left(self.__values, value)
+        high = bisect_right(self.__values, value, low)
+        return bisect_left(self.__keys, key, low, high)
+
+    def __sort(self):
+        """Sort the pending entries into the lists."""
+        if not self.__pending:
+            return
+        if len(self.__pending) < 64:
+            for value, key in self.__pending:
+                position = self.__position(value, key)
+                self.__values.insert(position, value)
+                self.__keys.insert(position, key)
+        else:
+            entries = list(zip(self.__values, self.__keys))
+            entries.extend(self.__pending)
+            entries.sort()
+            self.__values = array("d", (value for value, _ in entries))
+            self.__keys = [key for _, key in entries]
+        self.__pending = []
+
+
+class InvertedIndex:
+    """Map the members of a list attribute to the keys holding them.
+
+    Every indexed key gets a dense ordinal, and the posting of each
+    member is a sorted array("l") of ordinals, so intersections and
+    unions cost in proportion to the postings involved rather than to
+    the number of keys. Attributes that are not lists, tuples or sets
+    are left out.
+
+    Attributes:
+        name (str): the indexed attribute.
+        names (tuple): (name,).
+    """
+
+    def __init__(self, name):
+        """Initialize an empty index on the attribute name."""
+        self.name = name
+        self.names = (name,)
+        self.__postings = {}
+        self.__members = {}
+        self.__ordinals = {}
+        self.__keys = []
+        self.__free = []
+
+    def add(self, key, obj):
+        """Index the members of obj under key, replacing any previous."""
+        self.discard(key)
+        members = getattr(obj, self.name, None)
+        if not isinstance(members, (list, tuple, set)):
+            return
+        try:
+            members = frozenset(members)
+        except TypeError:
+            return
+        if self.__free:
+            ordinal = self.__free.pop()
+            self.__keys[ordinal] = key
+        else:
+            ordinal = len(self.__keys)
+            self.__keys.append(key)
+        self.__ordinals[key] = ordinal
+        self.__members[key] = members
+        for member in members:
+            posting = self.__postings.get(member)
+            if posting is None:
+                posting = self.__postings[member] = array("l")
+            posting.insert(bisect_left(posting, ordinal), ordinal)
+
+    def discard(self, key):
+        """Drop the entry of key, if any."""
+        ordinal = self.__ordinals.pop(key, None)
+        if ordinal is None:
+            return
+        for member in self.__members.pop(key):
+            posting = self.__postings[member]
+            del posting[bisect_left(posting, ordinal)]
+            if not posting:
+                del self.__postings[member]
+        self.__keys[ordinal] = None
+        self.__free.append(ordinal)
+
+    def clear(self):
+        """Drop every entry."""
+        self.__postings.clear()
+        self.__members.clear()
+        self.__ordinals.clear()
+        self.__keys.clear()
+        self.__free.clear()
+
+    def all_of(self, members):
+        """Return the keys holding every one of members."""
+        postings = sorted((self.__postings.get(member, ())
+                           for member in set(members)), key=len)
+        if not postings:
+            return []
+        ordinals = postings[0]
+        for posting in postings[1:]:
+            ordinals = _intersect(ordinals, posting)
+        return [self.__keys[ordinal] for ordinal in ordinals]
+
+    def any_of(self, members):
+        """Return the keys holding at least one of members."""
+        ordinals = set()
+        for member in set(members):
+            ordinals.update(self.__postings.get(member, ()))
+        return [self.__keys[ordinal] for ordinal in sorted(ordinals)]
+
+
+def _intersect(small, large):
+    """Return the sorted ordinals found in both sorted sequences.
+
+    When large dwarfs small, each ordinal of small is looked up in it
+    with bisect; otherwise a set intersection is cheaper.
+    """
+    if len(large) <= 32 * len(small):
+        return sorted(set(small).intersection(large))
+    found = []
+    low = 0
+    for ordinal in small:
+        low = bisect_left(large, ordinal, low)
+        if low == len(large):
+            break
+        if large[low] == ordinal:
+            found.append(ordinal)
+    return found
+
+
+class TextIndex:
+    """Full-text index over the string attributes names.
+
+    Text is split into lowercase words; each word maps to the keys
+    whose text holds it, with the number of times it does. search()
+    ranks the keys holding any word of the query with BM25, so its
+    cost follows the postings of the query words.
+
+    Attributes:
+        names (tuple): the indexed attributes.
+        k1 (float): BM25 term frequency saturation.
+        b (float): BM25 length normalization.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, names):
+        """Initialize an empty index on the attributes names."""
+        self.names = tuple(names)
+        self.__postings = {}
+        self.__terms = {}
+        self.__lengths = {}
+        self.__total = 0
+
+    def add(self, key, obj):
+        """Index the text of obj under key, replacing any previous."""
+        self.discard(key)
+        words = []
+        for name in self.names:
+            text = getattr(obj, name, None)
+            if isinstance(text, str):
+                words.extend(tokenize(text))
+        if not words:
+            return
+        counts = Counter(words)
+        for term, count in counts.items():
+            self.__postings.setdefault(term, {})[key] = count
+        self.__terms[key] = tuple(counts)
+        self.__lengths[key] = len(words)
+        self.__total += len(words)
+
+    def discard(self, key):
+        """Drop the entry of key, if any."""
+        terms = self.__terms.pop(key, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self.__postings[term]
+            del posting[key]
+            if not posting:
+                del self.__postings[term]
+        self.__total -= self.__lengths.pop(key)
+
+    def clear(self):
+        """Drop every entry."""
+        self.__postings.clear()
+        self.__terms.clear()
+        self.__lengths.clear()
+        self.__total = 0
+
+    def search(self, query, limit=10):
+        """Return [(score, key)] of the best matches of query, best first.
+
+        At most limit results are returned, all of them with None.
+        """
+        count = len(self.__lengths)
+        if not count:
+            return []
+        lengths = self.__lengths
+        k1 = self.k1
+        norm = k1 * (1 - self.b)
+        scale = k1 * self.b * count / self.__total
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.__postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (count - len(posting) + 0.5) /
+                           (len(posting) + 0.5))
+            for key, tf in posting.items():
+                scores[key] = scores.get(key, 0.0) + idf * tf * (k1 + 1) / (
+                    tf + norm + scale * lengths[key])
+        ranked = ((score, key) for key, score in scores.items())
+        if limit is None:
+            return sorted(ranked, key=lambda item: (-item[0], item[1]))
+        return heapq.nsmallest(limit, ranked,
+                               key=lambda item: (-item[0], item[1]))
+
+
+def tokenize(text):
+    """Return the lowercase words of text."""
+    return _WORD.findall(text.lower())
+
+
+class GridIndex:
+    """Map the cells of a latitude/longitude grid to the points in them.
+
+    Points are bucketed in cells of `cell` degrees on each side, so a
+    box or radius query only looks at the cells it overlaps. Objects
+    whose coordinates are not numbers, or are out of range, are left
+    out.
+
+    Attributes:
+        names (tuple): the latitude and longitude attributes.
+        cell (float): the side of a cell, in degrees.
+    """
+
+    def __init__(self, names=("latitude", "longitude"), cell=0.1):
+        """Initialize an empty index on the attributes names."""
+        self.names = tuple(names)
+        self.cell = cell
+        self.__cells = {}
+        self.__where = {}
+
+    def add(self, key, obj):
+        """Index the point of obj under key, replacing any previous one."""
+        self.discard(key)
+        try:
+            lat = float(getattr(obj, self.names[0], None))
+            lon = float(getattr(obj, self.names[1], None))
+        except (TypeError, ValueError):
+            return
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return
+        cell = (math.floor(lat / self.cell), math.floor(lon / self.cell))
+        self.__cells.setdefault(cell, {})[key] = (lat, lon)
+        self.__where[key] = cell
+
+    def discard(self, key):
+        """Drop the point of key, if any."""
+        cell = self.__where.pop(key, None)
+        if cell is None:
+            return
+        points = self.__cells[cell]
+        del points[key]
+        if not points:
+            del self.__cells[cell]
+
+    def clear(self):
+        """Drop every point."""
+        self.__cells.clear()
+        self.__where.clear()
+
+    def box(self, south, west, north, east):
+        """Return {key: (latitude, longitude)} of the points in a box.
+
+        Bounds are inclusive; a box with west > east crosses the
+        antimeridian.
+        """
+        spans = [(west, east)] if west <= east else [(west, 180.0),
+                                                     (-180.0, east)]
+        rows = range(math.floor(south / self.cell),
+                     math.floor(north / self.cell) + 1)
+        found = {}
+        for left, right in spans:
+            columns = range(math.floor(left / self.cell),
+                            math.floor(right / self.cell) + 1)
+            if len(rows) * len(columns) <= len(self.__cells):
+                cells = [(row, column) for row in rows
+                         for column in columns]
+            else:
+                cells = [cell for cell in self.__cells
+                         if cell[0] in rows and cell[1] in columns]
+            for cell in cells:
+                for key, (lat, lon) in self.__cells.get(cell, {}).items():
+                    if south <= lat <= north and left <= lon <= right:
+                        found[key] = (lat, lon)
+        return found
+
+    def near(self, latitude, longitude, radius):
+        """Return [(distance, key)] of the points within radius km.
+
+        Distances are in km from (latitude, longitude), nearest first.
+        """
+        found = []
+        for key, (lat, lon) in self.box(
+                *bounds(latitude, longitude, radius)).items():
+            d = distance(latitude, longitude, lat, lon)
+            if d <= radius:
+                found.append((d, key))
+        found.sort()
+        return found
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """Return the great-circle distance between two points, in km."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = (math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) *
+         math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(h)))
+
+
+def bounds(latitude, longitude, radius):
+    """Return the (south, west, north, east) box of a radius in km."""
+    angle = radius / EARTH_RADIUS
+    south = latitude - math.degrees(angle)
+    north = latitude + math.degrees(angle)
+    if south <= -90 or north >= 90 or angle >= math.pi / 2:
+        return max(south, -90.0), -180.0, min(north, 90.0), 180.0
+    spread = math.degrees(math.asin(
+        min(1.0, math.sin(angle) / math.cos(math.radians(latitude)))))
+    west = longitude - spread
+    east = longitude + spread
+    if west < -180:
+        west += 360
+    if east > 180:
+        east -= 360
+    return south, west, north, east
+
+
+def center(south, west, north, east):
+    """Return the (latitude, longitude) center of a box."""
+    if west > east:
+        east += 360
+    return (south + north) / 2, ((west + east) / 2 + 180) % 360 - 180
@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+"""Defines the Journal class used by FileStorage's journaled mode."""
+import json
+import os
+import time
+
+
+class Journal:
+    """Append-only log of per-object storage records.
+
+    Each line of the log is one JSON record, either
+    {"op": "put", "key": <key>, "value": <dict>} or
+    {"op": "delete", "key": <key>}.
+
+    Appends are fsynced in groups: an append is only flushed to disk
+    if the previous fsync is at least `fsync_interval` seconds old, and
+    sync() flushes whatever is left. With an interval of 0 every append
+    is fsynced; with None the log is never fsynced.
+
+    Attributes:
+        path (str): path of the log file.
+        count (int): number of records appended since the last truncate.
+        size (int): bytes of the log read or written by this process.
+    """
+
+    def __init__(self, path, fsync_interval=None):
+        """Initialize a journal stored at path."""
+        self.path = path
+        self.count = 0
+        self.size = 0
+        self.__fsync_interval = fsync_interval
+        self.__synced_at = time.monotonic()
+        self.__unsynced = False
+
+    def append(self, records):
+        """Append records to the log in a single write.
+
+        Args:
+            records (list): (key, encoded value) pairs, where the value
+                is the JSON text of the object, or None for a delete.
+        """
+        if not records:
+            return
+        lines = "".join(self.format(key, encoded) for key, encoded in records)
+        lines = lines.encode()
+        with open(self.path, "ab") as f:
+            f.write(lines)
+            if self.__fsync_interval is not None:
+                self.__unsynced = True
+                if (time.monotonic() - self.__synced_at >=
+                        self.__fsync_interval):
+                    f.flush()
+                    self.__fsync(f.fileno())
+        self.count += len(records)
+        self.size += len(lines)
+
+    def sync(self):
+        """fsync the records appended since the last fsync, if any."""
+        if not self.__unsynced:
+            return
+        with open(self.path, "a") as f:
+            self.__fsync(f.fileno())
+
+    def __fsync(self, fd):
+        """fsync fd and record when it was done."""
+        os.fsync(fd)
+        self.__synced_at = time.monotonic()
+        self.__unsynced = False
+
+    @staticmethod
+    def format(key, encoded):
+        """Return the log line recording encoded under key."""
+        if encoded is None:
+            return '{"op": "delete", "key": %s}\n' % json.dumps(key)
+        return '{"op": "put", "key": %s, "value": %s}\n' % (
+            json.dumps(key), encoded)
+
+    def replay(self, start=0):
+        """Yield every record of the log in the order it was written.
+
+        With start, only the records from that byte offset on are
+        read, e.g. those appended by another process since size. A
+        torn final line, left by a crash in the middle of an append, is
+        ignored and cut off the log so that later appends follow the
+        last complete record.
+        """
+        if start == 0:
+            self.count = 0
+        size = start
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    size += len(line)
+                    self.count += 1
+                    yield record
+        except FileNotFoundError:
+            self.size = 0
+            return
+        self.size = size
+        if os.path.getsize(self.path) > size:
+            os.truncate(self.path, size)
+
+    def truncate(self):
+        """Discard every record of the log."""
+        with open(self.path, "w") as f:
+            if self.__fsync_interval is not None:
+                self.__fsync(f.fileno())
+        self.count = 0
+        self.size = 0
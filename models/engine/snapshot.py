@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+"""Defines the helpers reading and writing the JSON snapshot.
+
+The snapshot is a JSON object written with one entry per line:
+
+    {
+    "BaseModel.<id>": {...},
+    "User.<id>": {...}
+    }
+
+so it stays loadable with json.load, while each entry can also be
+located by a cheap scan and decoded on its own.
+"""
+import json
+import os
+
+_decoder = json.JSONDecoder()
+
+
+def dump(file, entries):
+    """Write the (key, encoded value) pairs of entries to file.
+
+    Returns {key: (offset, length)} locating each entry in the file.
+    """
+    offsets = {}
+    file.write("{\n")
+    position = 2
+    separator = ""
+    for key, encoded in entries:
+        text = json.dumps(key) + ": " + encoded
+        file.write(separator + text)
+        position += len(separator)
+        offsets[key] = (position, len(text.encode()))
+        position += offsets[key][1]
+        separator = ",\n"
+    file.write("\n}\n")
+    return offsets
+
+
+def write(path, dump, fsync=False, mode="w"):
+    """Atomically replace path with what dump(file) writes.
+
+    The data goes to `<path>.tmp`, which is renamed over path once
+    complete, so a crash leaves either the old or the new file, never a
+    truncated one. With fsync, the data and the rename are flushed to
+    disk before returning.
+
+    Returns what dump returned.
+    """
+    result = stage(path, dump, fsync, mode)
+    commit(path, fsync)
+    return result
+
+
+def stage(path, dump, fsync=False, mode="w"):
+    """Write what dump(file) writes to `<path>.tmp`.
+
+    This is the first half of write(); commit() does the second one,
+    renaming the file over path. Returns what dump returned.
+    """
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, mode) as file:
+            result = dump(file)
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return result
+
+
+def commit(path, fsync=False):
+    """Rename the file written by stage() over path."""
+    try:
+        os.replace(path + ".tmp", path)
+    except BaseException:
+        if os.path.exists(path + ".tmp"):
+            os.remove(path + ".tmp")
+        raise
+    if fsync and hasattr(os, "O_DIRECTORY"):
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def scan(path):
+    """Return {key: (offset, length)} for the entries of path.
+
+    Only the keys are decoded. None is returned when the file does not
+    use the line-per-entry layout, e.g. when written by json.dump.
+    """
+    offsets = {}
+    with open(path, "rb") as f:
+        if f.readline().strip() != b"{":
+            return None
+        offset = f.tell()
+        for line in f:
+            if line.startswith(b'"'):
+                key, _ = _decoder.raw_decode(line.decode())
+                offsets[key] = (offset, len(line))
+            elif line.strip() not in (b"", b"}"):
+                return None
+            offset += len(line)
+    return offsets
+
+
+def read(path):
+    """Return the (key, encoded value) pairs of every entry of path.
+
+    Files not using the line-per-entry layout are decoded with
+    json.load and their values re-encoded.
+    """
+    with open(path, "r") as f:
+        text = f.read()
+    lines = text.splitlines()
+    if lines and lines[0].strip() == "{":
+        entries = []
+        for line in lines[1:]:
+            if line.startswith('"'):
+                entries.append(split(line))
+            elif line.strip() not in ("", "}"):
+                break
+        else:
+            return entries
+    return [(key, json.dumps(value))
+            for key, value in json.loads(text).items()]
+
+
+def load(path, offsets):
+    """Yield (key, encoded value) for the entries located by offsets."""
+    if not offsets:
+        return
+    with open(path, "rb") as f:
+        for key, (offset, length) in sorted(offsets.items(),
+                                            key=lambda item: item[1]):
+            f.seek(offset)
+            yield split(f.read(length).decode())
+
+
+def split(line):
+    """Return the key and the encoded value of one snapshot line."""
+    key, end = _decoder.raw_decode(line)
+    return key, line[line.index(":", end) + 1:].strip().rstrip(",")
@@ -139,6 +139,15 @@ class TestBaseModel(unittest.TestCase):
         bm.save()
         self.assertNotEqual(second_updated_at, bm.updated_at)
 
+    def test_save_adds_only_unstored_instances(self):
+        bm = BaseModel()
+        detached = BaseModel.from_dict({})
+        with patch("models.base_model.storage.new") as new:
+            bm.save()
+            new.assert_not_called()
+            detached.save()
+            new.assert_called_once_with(detached)
+
     def test_str_representation(self):
         dt = datetime.today()
         dt_repr = repr(dt)
@@ -169,6 +178,30 @@ class TestBaseModel(unittest.TestCase):
         self.assertEqual(str, type(bm_dict["created_at"]))
         self.assertEqual(str, type(bm_dict["updated_at"]))
 
+    def test_from_dict_matches_kwargs(self):
+        bm = BaseModel()
+        bm.name = "Loft"
+        data = bm.to_dict()
+        obj = BaseModel.from_dict(data)
+        self.assertEqual(str(BaseModel(**data)), str(obj))
+        self.assertEqual(bm.created_at, obj.created_at)
+        self.assertIsNot(bm, obj)
+        self.assertEqual(data, obj.to_dict())
+
+    def test_from_dict_defaults(self):
+        with patch("models.base_model.storage") as storage:
+            obj = BaseModel.from_dict({"created_at": "2024-01-02T03:04:05"})
+            storage.new.assert_not_called()
+        self.assertEqual(datetime(2024, 1, 2, 3, 4, 5), obj.created_at)
+        self.assertEqual(36, len(obj.id))
+        self.assertEqual(datetime, type(obj.updated_at))
+
+    def test_from_dicts(self):
+        values = [BaseModel().to_dict() for _ in range(3)]
+        objects = BaseModel.from_dicts(values)
+        self.assertEqual([value["id"] for value in values],
+                         [obj.id for obj in objects])
+
 
 if __name__ == '__main__':
     unittest.main()
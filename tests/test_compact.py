@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+"""Defines unittests for models/compact.py.
+
+Unittest classes:
+    TestCompact_records
+"""
+import unittest
+from datetime import datetime
+from models.base_model import BaseModel
+from models.compact import compact, compact_class
+from models.place import Place
+
+
+class TestCompact_records(unittest.TestCase):
+    """Unittests for testing the compact model records."""
+
+    def setUp(self):
+        self.place = Place()
+        self.place.name = "Loft"
+        self.place.max_guest = 4
+        self.record = compact(self.place)
+
+    def test_has_no_dict(self):
+        self.assertFalse(hasattr(self.record, "__dict__"))
+        self.assertIsInstance(self.record._id, bytes)
+        self.assertIsInstance(self.record._created_at, int)
+
+    def test_same_attributes(self):
+        self.assertEqual(self.place.id, self.record.id)
+        self.assertEqual(self.place.created_at, self.record.created_at)
+        self.assertIsInstance(self.record.updated_at, datetime)
+        self.assertEqual("Loft", self.record.name)
+        self.assertEqual(4, self.record.max_guest)
+        self.assertEqual(0, self.record.price_by_night)
+        with self.assertRaises(AttributeError):
+            self.record.missing
+
+    def test_same_to_dict_and_str(self):
+        self.assertEqual(self.place.to_dict(), self.record.to_dict())
+        self.assertEqual(str(self.place), str(self.record))
+
+    def test_attribute_order(self):
+        place = Place()
+        place.rating = 5
+        place.max_guest = 4
+        place.name = "Loft"
+        place.max_guest = 6
+        record = compact(place)
+        self.assertEqual(str(place), str(record))
+        self.assertEqual(list(place.to_dict()), list(record.to_dict()))
+        self.assertIs(record._order, compact(place)._order)
+
+    def test_extra_attributes(self):
+        self.place.rating = 5
+        record = compact(self.place)
+        self.assertEqual(5, record.rating)
+        self.assertEqual(self.place.to_dict(), record.to_dict())
+
+    def test_from_to_dict_and_back(self):
+        record = compact_class(Place)(**self.place.to_dict())
+        self.assertEqual(self.place.to_dict(), record.to_dict())
+        obj = record.to_model()
+        self.assertIs(Place, type(obj))
+        self.assertEqual(self.place.to_dict(), obj.to_dict())
+
+    def test_non_uuid_id(self):
+        record = compact_class(BaseModel)(
+            id="345", created_at="2022-01-01T00:00:00.000000",
+            updated_at="2022-01-01T00:00:00.000000")
+        self.assertEqual("345", record.id)
+        self.assertEqual("[BaseModel] (345)", str(record)[:17])
+
+
+if __name__ == "__main__":
+    unittest.main()
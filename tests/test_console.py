@@ -0,0 +1,289 @@
+#!/usr/bin/python3
+"""Defines unittests for console.py.
+
+Unittest classes:
+    TestHBNBCommand_parse
+    TestHBNBCommand_dot_syntax
+    TestHBNBCommand_batch
+    TestHBNBCommand_import_export
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+from console import HBNBCommand, convert, parse
+from models.engine import snapshot
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.user import User
+
+
+class TestHBNBCommand_parse(unittest.TestCase):
+    """Unittests for testing the command tokenizer."""
+
+    def test_words_and_quotes(self):
+        self.assertEqual(["User", "1234", "name", "John Paul"],
+                         parse('User 1234 name "John Paul"'))
+        self.assertEqual(["name", "Loft house"], parse("name 'Loft house'"))
+        self.assertEqual(['say "hi"'], parse(r'"say \"hi\""'))
+        self.assertEqual([], parse("   "))
+
+    def test_commas(self):
+        self.assertEqual(["1234", "name", "x"],
+                         parse('"1234", "name", "x"'))
+        self.assertEqual(["1,5"], parse("1,5,"))
+
+    def test_groups_are_kept_whole(self):
+        self.assertEqual(["1234", '{"name": "Loft", "max_guest": 4}'],
+                         parse('"1234", {"name": "Loft", "max_guest": 4}'))
+        self.assertEqual(["ids", "[1, 2]"], parse("ids [1, 2]"))
+
+
+class TestHBNBCommand_dot_syntax(unittest.TestCase):
+    """Unittests for testing the <class>.<command>(<args>) syntax."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fs = FileStorage(os.path.join(self.tmpdir, "file.json"))
+        for target in ("console.storage", "models.base_model.storage"):
+            patcher = patch(target, self.fs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_command(self, line):
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd(line)
+        return output.getvalue().strip()
+
+    def test_show(self):
+        self.assertEqual(str(self.user), self.run_command(
+            'User.show("{}")'.format(self.user.id)))
+        self.assertEqual("** no instance found **",
+                         self.run_command('User.show("missing")'))
+
+    def test_all_and_create(self):
+        output = self.run_command("User.create()")
+        self.assertIsNotNone(self.fs.get(User, output))
+        self.assertIn(self.user.id, self.run_command("User.all()"))
+        self.assertEqual("** class doesn't exist **",
+                         self.run_command("Foo.all()"))
+
+    def test_count(self):
+        self.assertEqual("1", self.run_command("count User"))
+        self.assertEqual("1", self.run_command("User.count()"))
+        self.assertEqual("0", self.run_command("count Place"))
+        self.assertEqual("** class doesn't exist **",
+                         self.run_command("count Foo"))
+
+    def test_all_pages(self):
+        users = sorted([self.user] + [User() for _ in range(4)],
+                       key=lambda user: user.id)
+        self.assertEqual("\n".join(map(str, users)),
+                         self.run_command("all User stream"))
+        self.assertEqual("\n".join(map(str, users[1:3])),
+                         self.run_command("all User limit=2 offset=1"))
+        self.assertEqual("\n".join(map(str, users[3:])), self.run_command(
+            "all User after={}".format(users[2].id)))
+        self.assertEqual("** invalid option: limit=x **",
+                         self.run_command("all User limit=x"))
+
+    def test_update(self):
+        self.run_command('User.update("{}", "first_name", "John Paul")'
+                         .format(self.user.id))
+        self.assertEqual("John Paul", self.user.first_name)
+        self.run_command('User.update("{}", {{"email": "a@b.c", '
+                         '"age": 30}})'.format(self.user.id))
+        self.assertEqual("a@b.c", self.user.email)
+        self.assertEqual(30, self.user.age)
+
+    def test_update_read_only(self):
+        for name, args in [("created_at", '"created_at", "foo"'),
+                           ("id", '"id", "other"'),
+                           ("__class__", '{"name": "x", "__class__": "y"}')]:
+            self.assertEqual("** {} can't be updated **".format(name),
+                             self.run_command('User.update("{}", {})'.format(
+                                 self.user.id, args)))
+        self.assertEqual(["User." + self.user.id], list(self.fs.all()))
+        self.assertFalse(hasattr(self.user, "name"))
+        self.assertEqual("** invalid dictionary **", self.run_command(
+            'User.update("{}", {{1: 2}})'.format(self.user.id)))
+        self.fs.save()
+
+    def test_destroy(self):
+        self.run_command('User.destroy("{}")'.format(self.user.id))
+        self.assertIsNone(self.fs.get(User, self.user.id))
+
+    def test_unknown_syntax(self):
+        self.assertEqual("*** Unknown syntax: User.nope()",
+                         self.run_command("User.nope()"))
+
+
+class TestHBNBCommand_batch(unittest.TestCase):
+    """Unittests for testing the non-interactive batch mode."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fs = FileStorage(os.path.join(self.tmpdir, "file.json"))
+        for target in ("console.storage", "models.base_model.storage"):
+            patcher = patch(target, self.fs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User()
+        self.fs.save()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_batch(self, lines):
+        errors = StringIO()
+        with patch("sys.stdout", new=StringIO()) as output:
+            failed = HBNBCommand().run_batch(lines, errors)
+        return failed, output.getvalue(), errors.getvalue()
+
+    def test_single_write(self):
+        lines = ["create User", "# comment", "", "create Place",
+                 "update User {} first_name Betty".format(self.user.id)]
+        with patch.object(snapshot, "dump", wraps=snapshot.dump) as dump:
+            failed, output, errors = self.run_batch(lines)
+        self.assertEqual(1, dump.call_count)
+        self.assertEqual(0, failed)
+        self.assertEqual(2, len(output.split()))
+        self.assertIn("3 commands, 0 errors", errors)
+        self.assertEqual(3, self.fs.count())
+        self.assertEqual("Betty", self.user.first_name)
+
+    def test_quit_flushes_write_behind(self):
+        fs = FileStorage(os.path.join(self.tmpdir, "behind.json"),
+                         write_behind=60)
+        saved = FileStorage(os.path.join(self.tmpdir, "behind.json"))
+        with patch("console.storage", fs), \
+                patch("models.base_model.storage", fs), \
+                patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create User")
+            self.assertEqual({}, saved.reload())
+            self.assertTrue(HBNBCommand().onecmd("quit"))
+        saved.reload()
+        self.assertIsNotNone(saved.get(User, output.getvalue().strip()))
+
+    def test_errors_do_not_abort(self):
+        lines = ["show User {}".format(self.user.id),
+                 "create User", "quit", "create User"]
+        with patch.object(HBNBCommand, "do_show",
+                          side_effect=RuntimeError("boom")):
+            failed, output, errors = self.run_batch(lines)
+        self.assertEqual(1, failed)
+        self.assertIn("line 1: RuntimeError: boom", errors)
+        self.assertIn("3 commands, 1 errors", errors)
+        self.assertEqual(2, self.fs.count(User))
+        saved = FileStorage(os.path.join(self.tmpdir, "file.json"))
+        saved.reload()
+        self.assertEqual(2, saved.count(User))
+
+    def test_failed_commands_are_errors(self):
+        lines = ["create Foo", "create User", "show Place nope", "Foo.x()"]
+        failed, output, errors = self.run_batch(lines)
+        self.assertEqual(3, failed)
+        self.assertEqual(1, len(output.split()))
+        self.assertIsNotNone(self.fs.get(User, output.strip()))
+        self.assertIn("line 1: ** class doesn't exist **", errors)
+        self.assertIn("line 3: ** no instance found **", errors)
+        self.assertIn("line 4: *** Unknown syntax: Foo.x()", errors)
+        self.assertIn("4 commands, 3 errors", errors)
+
+    def test_failed_save_is_reported(self):
+        with patch.object(snapshot, "stage",
+                          side_effect=OSError("disk full")):
+            failed, output, errors = self.run_batch(["create User"])
+        self.assertEqual(1, failed)
+        self.assertIn("save: OSError: disk full", errors)
+        self.assertIn("1 commands, 1 errors", errors)
+
+
+class TestHBNBCommand_import_export(unittest.TestCase):
+    """Unittests for testing the import and export commands."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fs = FileStorage(os.path.join(self.tmpdir, "file.json"))
+        for target in ("console.storage", "models.base_model.storage"):
+            patcher = patch(target, self.fs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.lines = os.path.join(self.tmpdir, "places.ndjson")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_command(self, line):
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd(line)
+        return output.getvalue().strip().splitlines()
+
+    def test_convert(self):
+        value = convert(Place, {"number_rooms": "3", "max_guest": 4.0,
+                                "latitude": 2, "name": "Loft", "x": "1"})
+        self.assertEqual({"number_rooms": 3, "max_guest": 4,
+                          "latitude": 2.0, "name": "Loft", "x": "1"}, value)
+        self.assertIs(float, type(value["latitude"]))
+        for value in ({"number_rooms": 2.5}, {"number_rooms": "two"},
+                      {"number_rooms": True}, {"name": 3},
+                      {"amenity_ids": "wifi"}, {"__class__": "User"},
+                      {"id": 1}, {"created_at": 5},
+                      {"updated_at": "yesterday"}):
+            with self.assertRaises(ValueError):
+                convert(Place, value)
+
+    def test_round_trip(self):
+        places = [Place(name="Loft", number_rooms=2, latitude=1.5),
+                  Place(name="Shed", amenity_ids=["wifi"])]
+        for pl in places:
+            self.fs.new(pl)
+        self.assertEqual(["2 exported"],
+                         self.run_command("export Place " + self.lines))
+        self.fs.reload()
+        self.assertEqual(["2 imported, 0 skipped"],
+                         self.run_command("import Place " + self.lines))
+        for pl in places:
+            self.assertEqual(pl.to_dict(),
+                             self.fs.get(Place, pl.id).to_dict())
+        saved = FileStorage(os.path.join(self.tmpdir, "file.json"))
+        saved.reload()
+        self.assertEqual(2, saved.count(Place))
+
+    def test_invalid_lines_are_skipped(self):
+        with open(self.lines, "w") as f:
+            f.write(json.dumps({"id": "1", "number_rooms": "2"}) + "\n\n")
+            f.write(json.dumps({"id": "2", "number_rooms": 2.5}) + "\n")
+            f.write("[1]\nnot json\n")
+            f.write(json.dumps({"id": "3", "created_at": 5}) + "\n")
+        with open(self.lines, "ab") as f:
+            f.write(b'{"id": "\xff\xfe"}\n')
+        output = self.run_command("import Place " + self.lines)
+        self.assertEqual("** line 3: number_rooms must be int, not 2.5 **",
+                         output[0])
+        self.assertIn("** line 7: 'utf-8' codec can't decode", output[-2])
+        self.assertEqual("1 imported, 5 skipped", output[-1])
+        self.assertEqual(2, self.fs.get(Place, "1").number_rooms)
+        saved = FileStorage(os.path.join(self.tmpdir, "file.json"))
+        self.assertEqual(["Place.1"], list(saved.reload()))
+
+    def test_errors(self):
+        self.assertEqual(["** file name missing **"],
+                         self.run_command("import Place"))
+        self.assertEqual(["** class doesn't exist **"],
+                         self.run_command("export Foo x"))
+        self.assertEqual(["** file doesn't exist **"], self.run_command(
+            "import Place " + os.path.join(self.tmpdir, "missing")))
+        self.assertEqual(["** can't write file **"], self.run_command(
+            "export Place " + os.path.join(self.tmpdir, "missing", "x")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,232 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/db_storage.py.
+
+Unittest classes:
+    TestDBStorage_methods
+    TestDBStorage_batch
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+from models.engine.db_storage import DBStorage
+from models.place import Place
+from models.review import Review
+
+
+class TestDBStorage_methods(unittest.TestCase):
+    """Unittests for testing the methods of DBStorage."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "hbnb.db")
+        self.db = DBStorage(self.path)
+        self.db.reload()
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmpdir)
+
+    def reopen(self):
+        db = DBStorage(self.path)
+        db.reload()
+        self.addCleanup(db.close)
+        return db
+
+    def test_wal_mode(self):
+        db = sqlite3.connect(self.path)
+        self.addCleanup(db.close)
+        mode = db.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual("wal", mode)
+
+    def test_new_save_reload(self):
+        pl = Place()
+        pl.name = "Loft"
+        self.db.new(pl)
+        self.db.save()
+        obj = self.reopen().get(Place, pl.id)
+        self.assertIs(Place, type(obj))
+        self.assertEqual("Loft", obj.name)
+        self.assertEqual(pl.created_at, obj.created_at)
+
+    def test_unsaved_changes_are_not_committed(self):
+        pl = Place()
+        self.db.new(pl)
+        self.assertEqual(1, self.db.count(Place))
+        self.db.reload()
+        self.assertEqual(0, self.db.count(Place))
+
+    def test_get_returns_live_instance(self):
+        pl = Place()
+        self.db.new(pl)
+        self.assertIs(pl, self.db.get("Place", pl.id))
+        self.assertIsNone(self.db.get(Place, "missing"))
+
+    def test_all_and_count(self):
+        pl = Place()
+        rv = Review()
+        self.db.new(pl)
+        self.db.new(rv)
+        self.db.save()
+        db = self.reopen()
+        self.assertEqual(["Place." + pl.id], list(db.all(Place)))
+        self.assertEqual({"Place." + pl.id, "Review." + rv.id},
+                         set(db.all()))
+        self.assertEqual(2, db.count())
+        self.assertEqual(1, db.count("Review"))
+
+    def test_iterate(self):
+        places = [Place() for _ in range(5)]
+        for pl in places:
+            self.db.new(pl)
+        ids = sorted(pl.id for pl in places)
+        self.db.page_size = 2
+        self.assertEqual(ids, [obj.id for obj in self.db.iterate(Place)])
+        self.assertEqual(ids[3:], [obj.id for obj in
+                                   self.db.iterate(Place, after=ids[2])])
+        self.assertIs(places[0], self.db.get(Place, places[0].id))
+
+    def test_query(self):
+        pl1 = Place()
+        pl1.city_id = "c1"
+        pl2 = Place()
+        pl2.city_id = "c1"
+        pl2.name = "Loft"
+        self.db.new(pl1)
+        self.db.new(pl2)
+        self.db.save()
+        db = self.reopen()
+        self.assertEqual({"Place." + pl1.id, "Place." + pl2.id},
+                         set(db.query(Place, city_id="c1")))
+        self.assertEqual(["Place." + pl2.id],
+                         list(db.query(Place, city_id="c1", name="Loft")))
+        self.assertEqual({}, db.query(Place, city_id="c2"))
+
+    def test_touch_updates_indexed_column(self):
+        pl = Place()
+        self.db.new(pl)
+        self.db.save()
+        with patch("models.base_model.storage", self.db):
+            pl.city_id = "c2"
+        self.db.save()
+        self.assertEqual(["Place." + pl.id],
+                         list(self.reopen().query(Place, city_id="c2")))
+
+    def test_add_index_backfills(self):
+        pl = Place()
+        pl.name = "Loft"
+        self.db.new(pl)
+        self.db.save()
+        self.db.add_index(Place, "name")
+        self.db.save()
+        db = self.reopen()
+        self.assertEqual(["Place." + pl.id],
+                         list(db.query(Place, name="Loft")))
+
+    def test_near_and_within(self):
+        for name, lat, lon in [("sf", 37.7749, -122.4194),
+                               ("oakland", 37.8044, -122.2712),
+                               ("fiji", -17.7, 179.9)]:
+            self.db.new(Place(name=name, latitude=lat, longitude=lon))
+        self.db.save()
+        db = self.reopen()
+        self.assertEqual(["oakland", "sf"], [
+            obj.name for obj in db.near(Place, 37.80, -122.27, 20).values()])
+        box = db.within(Place, -20, 175, -10, -170)
+        self.assertEqual(["fiji"], [obj.name for obj in box.values()])
+
+    def test_query_range(self):
+        for price in [50, 10, 30, 30, 80]:
+            self.db.new(Place(price_by_night=price))
+        self.db.save()
+        db = self.reopen()
+        pages = []
+        cursor = None
+        while True:
+            objects, cursor = db.query_range(Place, "price_by_night", 20,
+                                             limit=2, cursor=cursor)
+            pages.append([obj.price_by_night for obj in objects.values()])
+            if cursor is None:
+                break
+        self.assertEqual([[30, 30], [50, 80]], pages)
+
+    def test_query_members(self):
+        pl1 = Place(amenity_ids=["wifi", "pool"])
+        pl2 = Place(amenity_ids=["wifi"])
+        pl3 = Place(amenity_ids="wifi")
+        for pl in (pl1, pl2, pl3):
+            self.db.new(pl)
+        self.db.save()
+        db = self.reopen()
+        self.assertEqual(["Place." + pl1.id], list(
+            db.query_members(Place, "amenity_ids", all_of=["wifi", "pool"])))
+        self.assertEqual({"Place." + pl1.id, "Place." + pl2.id}, set(
+            db.query_members(Place, "amenity_ids", any_of=["wifi", "spa"])))
+
+    def test_search(self):
+        rv1 = Review(text="Great view from the balcony")
+        rv2 = Review(text="Great host, great stay")
+        self.db.new(rv1)
+        self.db.new(rv2)
+        self.db.save()
+        db = self.reopen()
+        self.assertEqual(["Review." + rv2.id, "Review." + rv1.id],
+                         list(db.search(Review, "great")))
+        with patch("models.base_model.storage", db):
+            db.get(Review, rv1.id).text = "Quiet street"
+        db.delete(db.get(Review, rv2.id))
+        self.assertEqual({}, db.search(Review, "great"))
+        self.assertEqual(["Review." + rv1.id],
+                         list(db.search(Review, "quiet")))
+
+    def test_delete(self):
+        pl = Place()
+        self.db.new(pl)
+        self.db.save()
+        self.db.delete(pl)
+        self.db.save()
+        self.assertIsNone(self.reopen().get(Place, pl.id))
+
+
+class TestDBStorage_batch(unittest.TestCase):
+    """Unittests for testing DBStorage.batch()."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db = DBStorage(os.path.join(self.tmpdir, "hbnb.db"))
+        self.db.reload()
+        self.kept = Place()
+        self.kept.name = "Loft"
+        self.db.new(self.kept)
+        self.db.save()
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_rollback_on_exception(self):
+        created = Place()
+        with self.assertRaises(ValueError):
+            with self.db.batch():
+                self.db.new(created)
+                with patch("models.base_model.storage", self.db):
+                    self.kept.name = "Shed"
+                self.assertEqual(2, self.db.count(Place))
+                raise ValueError
+        self.assertEqual(1, self.db.count(Place))
+        self.assertIsNone(self.db.get(Place, created.id))
+        self.assertEqual("Loft", self.kept.name)
+        self.assertIs(self.kept, self.db.get(Place, self.kept.id))
+
+    def test_batch_commits_once(self):
+        with self.db.batch():
+            for _ in range(5):
+                self.db.new(Place())
+                self.db.save()
+        self.assertEqual(6, self.db.count(Place))
+
+
+if __name__ == "__main__":
+    unittest.main()
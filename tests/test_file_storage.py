@@ -0,0 +1,1310 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/file_storage.py.
+
+Unittest classes:
+    TestFileStorage_instances
+    TestFileStorage_journal
+    TestFileStorage_indexes
+    TestFileStorage_lazy
+    TestFileStorage_batch
+    TestFileStorage_durability
+    TestFileStorage_binary
+    TestFileStorage_sharded
+    TestFileStorage_columns
+    TestFileStorage_spatial
+    TestFileStorage_ranges
+    TestFileStorage_members
+    TestFileStorage_search
+    TestFileStorage_threadsafe
+    TestFileStorage_write_behind
+    TestFileStorage_multiprocess
+    TestFileStorage_async
+"""
+import asyncio
+import os
+import json
+import multiprocessing
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from models.base_model import BaseModel
+from models.engine import binary
+from models.engine import snapshot
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.review import Review
+
+
+class TestFileStorage_instances(unittest.TestCase):
+    """Unittests for testing that FileStorage holds live instances."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.fs = FileStorage(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_new_stores_instance(self):
+        pl = Place()
+        self.fs.new(pl)
+        self.assertIs(pl, self.fs.all()["Place." + pl.id])
+
+    def test_reload_builds_instances(self):
+        pl = Place()
+        pl.name = "Loft"
+        self.fs.new(pl)
+        self.fs.save()
+        fs = FileStorage(self.path)
+        fs.reload()
+        obj = fs.get(Place, pl.id)
+        self.assertIs(Place, type(obj))
+        self.assertEqual(pl.created_at, obj.created_at)
+        self.assertEqual("Loft", obj.name)
+
+    def test_save_only_encodes_new_objects(self):
+        pl1 = Place()
+        pl2 = Place()
+        self.fs.new(pl1)
+        self.fs.new(pl2)
+        self.fs.save()
+        self.fs.new(pl1)
+        with patch.object(Place, "to_dict", autospec=True,
+                          side_effect=BaseModel.to_dict) as to_dict:
+            self.fs.save()
+            self.assertEqual(1, to_dict.call_count)
+        fs = FileStorage(self.path)
+        self.assertEqual(2, len(fs.reload()))
+
+    def test_setattr_marks_object_dirty(self):
+        pl1 = Place()
+        pl2 = Place()
+        self.fs.new(pl1)
+        self.fs.new(pl2)
+        self.fs.save()
+        with patch("models.base_model.storage", self.fs):
+            pl2.name = "Loft"
+        with patch.object(Place, "to_dict", autospec=True,
+                          side_effect=BaseModel.to_dict) as to_dict:
+            self.fs.save()
+            self.assertEqual([((pl2,), {})], to_dict.call_args_list)
+        fs = FileStorage(self.path)
+        fs.reload()
+        self.assertEqual("Loft", fs.get(Place, pl2.id).name)
+
+    def test_setattr_updates_indexes(self):
+        pl = Place()
+        self.fs.new(pl)
+        with patch("models.base_model.storage", self.fs):
+            pl.city_id = "c1"
+        self.assertEqual([pl], list(self.fs.query(Place,
+                                                  city_id="c1").values()))
+
+    def test_save_without_changes_does_not_write(self):
+        self.fs.new(Place())
+        self.fs.save()
+        with patch("builtins.open") as mock_open:
+            self.fs.save()
+            mock_open.assert_not_called()
+
+    def test_touch_ignores_unknown_objects(self):
+        pl = Place()
+        self.fs.touch(pl, "name")
+        self.assertEqual(0, self.fs.count())
+
+    def test_reloaded_objects_are_not_encoded_again(self):
+        self.fs.new(Place())
+        self.fs.save()
+        self.fs.reload()
+        with patch.object(Place, "to_dict") as to_dict:
+            self.fs.save()
+            to_dict.assert_not_called()
+
+
+class TestFileStorage_journal(unittest.TestCase):
+    """Unittests for testing the journaled mode of FileStorage."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.fs = FileStorage(self.path, journal=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def journal_lines(self):
+        with open(self.path + ".log", "r") as f:
+            return [json.loads(line) for line in f]
+
+    def test_save_appends_only_changed_objects(self):
+        bm1 = BaseModel()
+        bm2 = BaseModel()
+        self.fs.new(bm1)
+        self.fs.new(bm2)
+        self.fs.save()
+        self.fs.new(bm1)
+        self.fs.save()
+        ops = [(r["op"], r["key"]) for r in self.journal_lines()]
+        self.assertEqual(3, len(ops))
+        self.assertEqual(("put", "BaseModel." + bm1.id), ops[-1])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_reload_replays_journal(self):
+        bm1 = BaseModel()
+        bm2 = BaseModel()
+        self.fs.new(bm1)
+        self.fs.new(bm2)
+        self.fs.save()
+        bm1.name = "Holberton"
+        self.fs.new(bm1)
+        self.fs.delete(bm2)
+        self.fs.save()
+        fs = FileStorage(self.path, journal=True)
+        objs = fs.reload()
+        self.assertEqual(["BaseModel." + bm1.id], list(objs))
+        self.assertEqual("Holberton", objs["BaseModel." + bm1.id].name)
+
+    def test_compaction_folds_journal_into_snapshot(self):
+        fs = FileStorage(self.path, journal=True, compact_threshold=3)
+        models = [BaseModel() for _ in range(3)]
+        for bm in models:
+            fs.new(bm)
+        fs.save()
+        self.assertEqual([], self.journal_lines())
+        with open(self.path, "r") as f:
+            self.assertEqual(3, len(json.load(f)))
+        fs.new(models[0])
+        fs.save()
+        reloaded = FileStorage(self.path, journal=True).reload()
+        self.assertEqual(3, len(reloaded))
+
+    def test_torn_last_record_is_ignored(self):
+        bm = BaseModel()
+        self.fs.new(bm)
+        self.fs.save()
+        with open(self.path + ".log", "a") as f:
+            f.write('{"op": "put", "key": "BaseModel.x", "val')
+        objs = FileStorage(self.path, journal=True).reload()
+        self.assertEqual(["BaseModel." + bm.id], list(objs))
+
+
+class TestFileStorage_indexes(unittest.TestCase):
+    """Unittests for testing class buckets and attribute indexes."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fs = FileStorage(os.path.join(self.tmpdir, "file.json"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_place(self, city_id, name=""):
+        pl = Place()
+        pl.city_id = city_id
+        pl.name = name
+        self.fs.new(pl)
+        return pl
+
+    def test_all_by_class(self):
+        pl = self.make_place("c1")
+        rv = Review()
+        self.fs.new(rv)
+        self.assertEqual(["Place." + pl.id], list(self.fs.all(Place)))
+        self.assertEqual(["Review." + rv.id], list(self.fs.all("Review")))
+        self.assertEqual(2, len(self.fs.all()))
+        self.assertEqual(1, self.fs.count(Place))
+        self.assertEqual(0, self.fs.count("User"))
+
+    def test_query_indexed_attribute(self):
+        pl1 = self.make_place("c1")
+        pl2 = self.make_place("c1", "Loft")
+        self.make_place("c2")
+        found = self.fs.query(Place, city_id="c1")
+        self.assertEqual({"Place." + pl1.id, "Place." + pl2.id}, set(found))
+        found = self.fs.query(Place, city_id="c1", name="Loft")
+        self.assertEqual(["Place." + pl2.id], list(found))
+        self.assertEqual({}, self.fs.query(Place, city_id="nowhere"))
+
+    def test_query_follows_update_and_delete(self):
+        pl = self.make_place("c1")
+        pl.city_id = "c2"
+        self.fs.new(pl)
+        self.assertEqual({}, self.fs.query(Place, city_id="c1"))
+        self.assertEqual(1, len(self.fs.query(Place, city_id="c2")))
+        self.fs.delete(pl)
+        self.assertEqual({}, self.fs.query(Place, city_id="c2"))
+        self.assertEqual(0, self.fs.count(Place))
+
+    def test_deleted_attribute(self):
+        pl = self.make_place("c1", "Loft")
+        self.fs.add_index(Place, "name")
+        self.fs.save()
+        with patch("models.base_model.storage", self.fs):
+            del pl.name
+        self.assertEqual({}, self.fs.query(Place, name="Loft"))
+        self.fs.save()
+        fs = FileStorage(os.path.join(self.tmpdir, "file.json"))
+        fs.reload()
+        self.assertNotIn("name", fs.get(Place, pl.id).__dict__)
+        self.assertEqual({}, fs.query(Place, name="Loft"))
+
+    def test_add_index_on_existing_objects(self):
+        pl = self.make_place("c1", "Loft")
+        self.fs.add_index(Place, "name")
+        self.assertEqual(["Place." + pl.id],
+                         list(self.fs.query(Place, name="Loft")))
+
+    def test_reload_rebuilds_indexes(self):
+        pl = self.make_place("c1")
+        self.fs.save()
+        fs = FileStorage(os.path.join(self.tmpdir, "file.json"))
+        fs.reload()
+        self.assertEqual(["Place." + pl.id],
+                         list(fs.query(Place, city_id="c1")))
+
+
+class TestFileStorage_lazy(unittest.TestCase):
+    """Unittests for testing the lazy reload mode of FileStorage."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        fs = FileStorage(self.path)
+        self.places = [Place() for _ in range(3)]
+        self.review = Review()
+        for obj in self.places + [self.review]:
+            fs.new(obj)
+        fs.save()
+        self.fs = FileStorage(self.path, lazy=True)
+        self.fs.reload()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_snapshot_is_still_json(self):
+        with open(self.path, "r") as f:
+            self.assertEqual(4, len(json.load(f)))
+
+    def test_count_decodes_nothing(self):
+        with patch("models.engine.snapshot.split") as decode:
+            self.assertEqual(4, self.fs.count())
+            self.assertEqual(3, self.fs.count(Place))
+            decode.assert_not_called()
+
+    def test_get_decodes_one_entry(self):
+        pl = self.places[1]
+        with patch("models.engine.snapshot.split",
+                   wraps=snapshot.split) as decode:
+            obj = self.fs.get(Place, pl.id)
+            self.assertEqual(1, decode.call_count)
+        self.assertIs(Place, type(obj))
+        self.assertEqual(pl.id, obj.id)
+        self.assertIsNone(self.fs.get(Place, "missing"))
+
+    def test_all_by_class(self):
+        self.assertEqual({"Place." + pl.id for pl in self.places},
+                         set(self.fs.all(Place)))
+        self.assertEqual(4, len(self.fs.all()))
+
+    def test_iterate_decodes_as_it_goes(self):
+        ids = sorted(pl.id for pl in self.places)
+        with patch("models.engine.snapshot.split",
+                   wraps=snapshot.split) as decode:
+            objects = self.fs.iterate(Place)
+            self.assertEqual(ids[0], next(objects).id)
+            self.assertEqual(1, decode.call_count)
+            self.assertEqual(ids[1:], [obj.id for obj in objects])
+        self.assertEqual(ids[2:], [obj.id for obj in
+                                   self.fs.iterate(Place, after=ids[1])])
+        self.assertEqual([], list(self.fs.iterate(Place, after=ids[2])))
+
+    def test_new_and_delete_unloaded_entries(self):
+        self.fs.delete(self.review)
+        pl = self.places[0]
+        pl.name = "Loft"
+        self.fs.new(pl)
+        self.fs.save()
+        self.assertEqual(3, self.fs.count(Place))
+        fs = FileStorage(self.path, lazy=True)
+        fs.reload()
+        self.assertEqual(0, fs.count(Review))
+        self.assertEqual("Loft", fs.get(Place, pl.id).name)
+
+    def test_falls_back_on_single_line_file(self):
+        with open(self.path, "w") as f:
+            json.dump({"Place.1": {"id": "1", "__class__": "Place"}}, f)
+        self.fs.reload()
+        self.assertEqual("1", self.fs.get(Place, "1").id)
+
+
+class TestFileStorage_batch(unittest.TestCase):
+    """Unittests for testing FileStorage.batch()."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.fs = FileStorage(self.path)
+        self.kept = Place()
+        self.kept.name = "Loft"
+        self.gone = Place()
+        self.fs.new(self.kept)
+        self.fs.new(self.gone)
+        self.fs.save()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_batch_writes_once(self):
+        with patch.object(snapshot, "dump", wraps=snapshot.dump) as dump:
+            with self.fs.batch():
+                for _ in range(10):
+                    self.fs.new(Place())
+                    self.fs.save()
+            self.assertEqual(1, dump.call_count)
+        fs = FileStorage(self.path)
+        self.assertEqual(12, len(fs.reload()))
+
+    def test_rollback_on_exception(self):
+        created = Place()
+        with self.assertRaises(ValueError):
+            with self.fs.batch():
+                self.fs.new(created)
+                with patch("models.base_model.storage", self.fs):
+                    self.kept.name = "Shed"
+                    self.kept.city_id = "c1"
+                self.fs.delete(self.gone)
+                raise ValueError
+        self.assertEqual(2, self.fs.count())
+        self.assertIsNone(self.fs.get(Place, created.id))
+        self.assertIs(self.kept, self.fs.get(Place, self.kept.id))
+        self.assertEqual("Loft", self.kept.name)
+        self.assertNotIn("city_id", self.kept.__dict__)
+        self.assertEqual({}, self.fs.query(Place, city_id="c1"))
+        self.assertIs(self.gone, self.fs.get(Place, self.gone.id))
+        fs = FileStorage(self.path)
+        self.assertEqual(2, len(fs.reload()))
+
+    def test_nested_batches_join_outer(self):
+        with self.assertRaises(ValueError):
+            with self.fs.batch():
+                with self.fs.batch():
+                    self.fs.new(Place())
+                self.assertEqual(3, self.fs.count())
+                raise ValueError
+        self.assertEqual(2, self.fs.count())
+
+    def test_rollback_in_journaled_mode(self):
+        fs = FileStorage(self.path, journal=True)
+        fs.reload()
+        pl = fs.get(Place, self.kept.id)
+        with self.assertRaises(ValueError):
+            with fs.batch():
+                pl.name = "Shed"
+                fs.touch(pl, "name")
+                raise ValueError
+        self.assertEqual("Loft", pl.name)
+        self.assertFalse(os.path.exists(self.path + ".log") and
+                         os.path.getsize(self.path + ".log"))
+
+
+class TestFileStorage_durability(unittest.TestCase):
+    """Unittests for testing atomic writes and fsync batching."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_crash_during_write_keeps_old_file(self):
+        fs = FileStorage(self.path)
+        fs.new(Place())
+        fs.save()
+        with open(self.path, "r") as f:
+            before = f.read()
+
+        def crash(file, entries):
+            file.write("{\n")
+            raise OSError("disk full")
+        fs.new(Place())
+        with patch.object(snapshot, "dump", side_effect=crash):
+            with self.assertRaises(OSError):
+                fs.save()
+        with open(self.path, "r") as f:
+            self.assertEqual(before, f.read())
+        self.assertEqual(["file.json"], os.listdir(self.tmpdir))
+
+    def test_snapshot_fsynced_when_interval_set(self):
+        fs = FileStorage(self.path, fsync_interval=60)
+        fs.new(Place())
+        with patch("os.fsync") as fsync:
+            fs.save()
+            self.assertTrue(fsync.called)
+
+    def test_journal_group_commit(self):
+        fs = FileStorage(self.path, journal=True, fsync_interval=3600)
+        with patch("os.fsync") as fsync:
+            for _ in range(5):
+                fs.new(Place())
+                fs.save()
+            self.assertLessEqual(fsync.call_count, 1)
+            fsync.reset_mock()
+            fs.sync()
+            self.assertEqual(1, fsync.call_count)
+            fs.sync()
+            self.assertEqual(1, fsync.call_count)
+
+    def test_journal_fsync_every_append(self):
+        fs = FileStorage(self.path, journal=True, fsync_interval=0)
+        with patch("os.fsync") as fsync:
+            for _ in range(3):
+                fs.new(Place())
+                fs.save()
+            self.assertEqual(3, fsync.call_count)
+
+    def test_torn_record_is_cut_before_next_append(self):
+        fs = FileStorage(self.path, journal=True)
+        pl1 = Place()
+        fs.new(pl1)
+        fs.save()
+        with open(self.path + ".log", "a") as f:
+            f.write('{"op": "put", "key": "Place.x", "val')
+        fs = FileStorage(self.path, journal=True)
+        fs.reload()
+        pl2 = Place()
+        fs.new(pl2)
+        fs.save()
+        objs = FileStorage(self.path, journal=True).reload()
+        self.assertEqual({"Place." + pl1.id, "Place." + pl2.id}, set(objs))
+
+    def test_lazy_rewrite_copies_unloaded_entries(self):
+        fs = FileStorage(self.path)
+        places = [Place() for _ in range(3)]
+        for pl in places:
+            fs.new(pl)
+        fs.save()
+        fs = FileStorage(self.path, lazy=True)
+        fs.reload()
+        fs.new(Place())
+        with patch.object(FileStorage, "classes") as classes:
+            fs.save()
+            classes.assert_not_called()
+        self.assertEqual(places[2].id, fs.get(Place, places[2].id).id)
+        self.assertEqual(4, len(FileStorage(self.path).reload()))
+
+
+class TestFileStorage_binary(unittest.TestCase):
+    """Unittests for testing the binary snapshot format."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.bin")
+        self.place = Place()
+        self.place.name = "Loft"
+        self.place.max_guest = 4
+        self.place.latitude = 37.77
+        self.place.amenity_ids = ["a1", "a2"]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_console(self, commands, **env):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=root, **env)
+        env.pop("HBNB_TYPE_STORAGE", None)
+        return subprocess.run(
+            [sys.executable, os.path.join(root, "console.py")],
+            input=commands, capture_output=True, text=True, cwd=self.tmpdir,
+            env=env, check=True).stdout.split()
+
+    def test_switch_format_with_environment(self):
+        id = self.run_console("create User\n")[0]
+        self.assertEqual(["1"], self.run_console(
+            "count User\ncreate User\n", HBNB_STORAGE_FORMAT="binary")[:1])
+        path = os.path.join(self.tmpdir, "file.json")
+        self.assertTrue(binary.is_binary(path))
+        self.assertEqual(["file.json"], os.listdir(self.tmpdir))
+        output = self.run_console("count User\nshow User {}\n".format(id))
+        self.assertEqual("2", output[0])
+        self.assertIn(id, output[2])
+
+    def test_record_round_trip(self):
+        value = self.place.to_dict()
+        record = binary.encode(value)
+        self.assertEqual(16, len(record[1]))
+        self.assertIsInstance(record[2], int)
+        self.assertEqual(value, binary.decode(record))
+
+    def test_non_canonical_values_are_kept(self):
+        value = {"__class__": "Place", "id": "345",
+                 "created_at": "2022-01-01T00:00:00.000000",
+                 "updated_at": "not a date"}
+        self.assertEqual(value, binary.decode(binary.encode(value)))
+
+    def test_save_and_reload(self):
+        fs = FileStorage(self.path, binary=True)
+        fs.new(self.place)
+        fs.new(Review())
+        fs.save()
+        self.assertTrue(binary.is_binary(self.path))
+        fs = FileStorage(self.path, binary=True)
+        fs.reload()
+        obj = fs.get(Place, self.place.id)
+        self.assertEqual(self.place.to_dict(), obj.to_dict())
+        self.assertEqual(1, fs.count(Review))
+
+    def test_many_chunks(self):
+        fs = FileStorage(self.path, binary=True)
+        with patch.object(binary, "CHUNK", 3):
+            for _ in range(10):
+                fs.new(Place())
+            fs.save()
+        self.assertEqual(10, len(FileStorage(self.path).reload()))
+
+    def test_round_trip_with_json(self):
+        json_path = os.path.join(self.tmpdir, "file.json")
+        fs = FileStorage(json_path)
+        fs.new(self.place)
+        fs.save()
+        os.rename(json_path, self.path)
+        fs = FileStorage(self.path, binary=True)
+        fs.reload()
+        fs.new(fs.get(Place, self.place.id))
+        fs.save()
+        self.assertTrue(binary.is_binary(self.path))
+        os.rename(self.path, json_path)
+        fs = FileStorage(json_path)
+        fs.reload()
+        fs.new(fs.get(Place, self.place.id))
+        fs.save()
+        with open(json_path, "r") as f:
+            saved = json.load(f)
+        self.assertEqual({"Place." + self.place.id: self.place.to_dict()},
+                         saved)
+
+    def test_rollback_after_binary_reload(self):
+        fs = FileStorage(self.path, binary=True)
+        fs.new(self.place)
+        fs.save()
+        fs.reload()
+        pl = fs.get(Place, self.place.id)
+        with self.assertRaises(ValueError):
+            with fs.batch():
+                pl.name = "Shed"
+                fs.touch(pl, "name")
+                raise ValueError
+        self.assertEqual("Loft", pl.name)
+
+
+class TestFileStorage_sharded(unittest.TestCase):
+    """Unittests for testing the sharded mode of FileStorage."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.fs = FileStorage(self.path, sharded=True)
+        self.fs.reload()
+        self.place = Place()
+        self.review = Review()
+        self.fs.new(self.place)
+        self.fs.new(self.review)
+        self.fs.save()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def shard(self, name):
+        with open(os.path.join(self.tmpdir, name), "r") as f:
+            return json.load(f)
+
+    def test_one_file_per_class(self):
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(["Place." + self.place.id],
+                         list(self.shard("Place.json")))
+        self.assertEqual(["Review." + self.review.id],
+                         list(self.shard("Review.json")))
+
+    def test_save_writes_dirty_shards_only(self):
+        self.fs.new(Review())
+        with patch("models.engine.snapshot.stage",
+                   wraps=snapshot.stage) as write:
+            self.fs.save()
+        self.assertEqual([os.path.join(self.tmpdir, "Review.json")],
+                         [call.args[0] for call in write.call_args_list])
+        self.assertEqual(2, len(self.shard("Review.json")))
+
+    def test_shards_are_read_on_demand(self):
+        fs = FileStorage(self.path, sharded=True)
+        fs.reload()
+        with patch("models.engine.snapshot.read",
+                   wraps=snapshot.read) as read:
+            self.assertEqual(["Review." + self.review.id],
+                             list(fs.all(Review)))
+            self.assertIsNotNone(fs.get(Review, self.review.id))
+        self.assertEqual([os.path.join(self.tmpdir, "Review.json")],
+                         [call.args[0] for call in read.call_args_list])
+        self.assertEqual(2, fs.count())
+
+    def test_new_and_delete_in_unread_shard(self):
+        fs = FileStorage(self.path, sharded=True)
+        fs.reload()
+        fs.new(Place())
+        fs.delete(fs.get(Review, self.review.id))
+        fs.save()
+        self.assertEqual(2, len(self.shard("Place.json")))
+        self.assertEqual({}, self.shard("Review.json"))
+
+    def test_journal_per_shard(self):
+        fs = FileStorage(self.path, sharded=True, journal=True)
+        fs.reload()
+        pl = fs.get(Place, self.place.id)
+        pl.name = "Loft"
+        fs.touch(pl, "name")
+        fs.save()
+        self.assertTrue(os.path.exists(
+            os.path.join(self.tmpdir, "Place.json.log")))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.tmpdir, "Review.json.log")))
+        fs = FileStorage(self.path, sharded=True, journal=True)
+        fs.reload()
+        self.assertEqual("Loft", fs.get(Place, self.place.id).name)
+
+
+class TestFileStorage_columns(unittest.TestCase):
+    """Unittests for testing the columnar views of FileStorage."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fs = FileStorage(os.path.join(self.tmpdir, "file.json"))
+        self.places = []
+        for i in range(6):
+            pl = Place(city_id="c{}".format(i % 2), price_by_night=i * 10,
+                       max_guest=i, latitude=30.0 + i)
+            self.fs.new(pl)
+            self.places.append(pl)
+        self.view = self.fs.columns(Place)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def keys(self, *indices):
+        return {"Place." + self.places[i].id for i in indices}
+
+    def test_default_columns(self):
+        self.assertIn("price_by_night", self.view.names)
+        self.assertIn("city_id", self.view.names)
+        self.assertNotIn("name", self.view.names)
+        self.assertEqual(6, len(self.view))
+
+    def test_filter(self):
+        view = self.view
+        self.assertEqual(self.keys(4, 5),
+                         set(view.keys(view.filter("max_guest", ">=", 4))))
+        self.assertEqual(self.keys(1, 3, 5),
+                         set(view.keys(view.filter("city_id", "==", "c1"))))
+        mask = view.both(view.filter("latitude", "between", (31, 34)),
+                         view.filter("city_id", "==", "c0"))
+        self.assertEqual(self.keys(2, 4), set(view.keys(mask)))
+        mask = view.either(view.filter("max_guest", "in", [0, 5]),
+                           view.filter("city_id", "==", "missing"))
+        self.assertEqual(self.keys(0, 5), set(view.keys(mask)))
+
+    def test_aggregates(self):
+        view = self.view
+        self.assertEqual(25, view.aggregate("price_by_night", "mean"))
+        self.assertEqual({"c0": 20, "c1": 30},
+                         view.group_by("city_id", "price_by_night", "mean"))
+        mask = view.filter("max_guest", "<", 2)
+        self.assertEqual(10, view.aggregate("price_by_night", "sum", mask))
+        self.assertEqual(2, view.aggregate("max_guest", "count", mask))
+
+    def test_kept_in_sync(self):
+        with patch("models.base_model.storage", self.fs):
+            self.places[0].price_by_night = "70"
+        self.fs.delete(self.places[5])
+        self.fs.new(Place(city_id="c1", price_by_night=100))
+        self.assertEqual(6, len(self.view))
+        self.assertEqual(100, self.view.aggregate("price_by_night", "max"))
+        self.assertEqual(
+            {"c0": 130, "c1": 140},
+            self.view.group_by("city_id", "price_by_night", "sum"))
+        self.fs.reload()
+        self.assertEqual(0, len(self.view))
+
+
+class TestFileStorage_spatial(unittest.TestCase):
+    """Unittests for testing the spatial queries of FileStorage."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fs = FileStorage(os.path.join(self.tmpdir, "file.json"))
+        self.places = {}
+        for name, lat, lon in [("sf", 37.7749, -122.4194),
+                               ("oakland", 37.8044, -122.2712),
+                               ("san_jose", 37.3382, -121.8863),
+                               ("fiji", -17.7, 179.9),
+                               ("samoa", -13.8, -171.8)]:
+            pl = Place(name=name, latitude=lat, longitude=lon)
+            self.fs.new(pl)
+            self.places[name] = "Place." + pl.id
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def names(self, objects):
+        return [obj.name for obj in objects.values()]
+
+    def test_near_sorted_by_distance(self):
+        self.assertEqual(["sf", "oakland"], self.names(
+            self.fs.near(Place, 37.77, -122.42, 20)))
+        self.assertEqual(["oakland", "sf", "san_jose"], self.names(
+            self.fs.near(Place, 37.80, -122.27, 80)))
+        self.assertEqual({}, self.fs.near(Place, 0, 0, 100))
+
+    def test_within(self):
+        self.assertEqual(["san_jose", "oakland", "sf"], self.names(
+            self.fs.within(Place, 37.0, -122.5, 38.0, -121.5)))
+        self.assertEqual(["fiji", "samoa"], self.names(
+            self.fs.within(Place, -20, 175, -10, -170)))
+
+    def test_near_across_antimeridian(self):
+        self.assertEqual(["fiji"], self.names(
+            self.fs.near(Place, -17.7, -179.9, 50)))
+
+    def test_index_follows_changes(self):
+        sf = self.fs.all()[self.places["sf"]]
+        with patch("models.base_model.storage", self.fs):
+            sf.latitude = "37.3"
+            sf.longitude = -121.9
+        self.assertEqual(["sf", "san_jose"], self.names(
+            self.fs.near(Place, 37.3, -121.9, 10)))
+        self.fs.delete(sf)
+        self.assertEqual(["san_jose"], self.names(
+            self.fs.near(Place, 37.3, -121.9, 10)))
+
+
+class TestFileStorage_ranges(unittest.TestCase):
+    """Unittests for testing the range queries of FileStorage."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fs = FileStorage(os.path.join(self.tmpdir, "file.json"))
+        self.places = []
+        for price in [50, 10, 30, 30, 80, 20, 30]:
+            pl = Place(price_by_night=price)
+            self.fs.new(pl)
+            self.places.append(pl)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def prices(self, objects):
+        return [obj.price_by_night for obj in objects.values()]
+
+    def test_range(self):
+        objects, cursor = self.fs.query_range(Place, "price_by_night",
+                                              20, 50)
+        self.assertEqual([20, 30, 30, 30, 50], self.prices(objects))
+        self.assertIsNone(cursor)
+        objects, _ = self.fs.query_range(Place, "price_by_night",
+                                         low=60, reverse=True)
+        self.assertEqual([80], self.prices(objects))
+
+    def test_pagination(self):
+        for reverse in (False, True):
+            pages = []
+            cursor = None
+            while True:
+                objects, cursor = self.fs.query_range(
+                    Place, "price_by_night", limit=3, cursor=cursor,
+                    reverse=reverse)
+                pages.append(self.prices(objects))
+                if cursor is None:
+                    break
+            expected = [[10, 20, 30], [30, 30, 50], [80]]
+            if reverse:
+                expected = [[80, 50, 30], [30, 30, 20], [10]]
+            self.assertEqual(expected, pages)
+
+    def test_ties_are_not_repeated(self):
+        keys = []
+        cursor = None
+        while True:
+            objects, cursor = self.fs.query_range(
+                Place, "price_by_night", 30, 30, limit=1, cursor=cursor)
+            keys.extend(objects)
+            if cursor is None:
+                break
+        self.assertEqual(3, len(set(keys)))
+        self.assertEqual(sorted(keys), keys)
+
+    def test_index_follows_changes(self):
+        with patch("models.base_model.storage", self.fs):
+            self.places[1].price_by_night = "90"
+            self.places[0].price_by_night = "n/a"
+        self.fs.delete(self.places[4])
+        objects, _ = self.fs.query_range(Place, "price_by_night", 40)
+        self.assertEqual(["90"], self.prices(objects))
+        objects, _ = self.fs.query_range(Place, "max_guest")
+        self.assertEqual(6, len(objects))
+
+
+class TestFileStorage_members(unittest.TestCase):
+    """Unittests for testing the amenity queries of FileStorage."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fs = FileStorage(os.path.join(self.tmpdir, "file.json"))
+        self.places = {}
+        for name, amenities in [("a", ["wifi", "pool", "parking"]),
+                                ("b", ["wifi", "parking"]),
+                                ("c", ["pool"]),
+                                ("d", [])]:
+            pl = Place(name=name, amenity_ids=amenities)
+            self.fs.new(pl)
+            self.places[name] = pl
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def names(self, **kwargs):
+        objects = self.fs.query_members(Place, "amenity_ids", **kwargs)
+        return sorted(obj.name for obj in objects.values())
+
+    def test_all_of(self):
+        self.assertEqual(["a", "b"], self.names(all_of=["wifi", "parking"]))
+        self.assertEqual(["a"], self.names(all_of=["wifi", "pool"]))
+        self.assertEqual([], self.names(all_of=["wifi", "spa"]))
+
+    def test_any_of(self):
+        self.assertEqual(["a", "b", "c"], self.names(any_of=["wifi", "pool"]))
+        self.assertEqual([], self.names())
+
+    def test_all_of_and_any_of(self):
+        self.assertEqual(["a", "b"], self.names(all_of=["parking"],
+                                                any_of=["wifi", "spa"]))
+        self.assertEqual(["a"], self.names(all_of=["parking"],
+                                           any_of=["pool"]))
+
+    def test_index_follows_changes(self):
+        with patch("models.base_model.storage", self.fs):
+            self.places["d"].amenity_ids = ["wifi", "pool"]
+            self.places["a"].amenity_ids = ["parking"]
+        self.fs.delete(self.places["c"])
+        self.assertEqual(["d"], self.names(all_of=["wifi", "pool"]))
+        self.assertEqual(["a", "b", "d"], self.names(any_of=["pool",
+                                                             "parking"]))
+
+    def test_large_intersections(self):
+        for i in range(200):
+            self.fs.new(Place(amenity_ids=["wifi"] if i % 2 else ["spa"]))
+        self.assertEqual(102, len(self.names(any_of=["wifi"])))
+        self.assertEqual(["a"], self.names(all_of=["wifi", "pool"]))
+
+
+class TestFileStorage_search(unittest.TestCase):
+    """Unittests for testing the full-text search of FileStorage."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fs = FileStorage(os.path.join(self.tmpdir, "file.json"))
+        self.reviews = {}
+        for name, text in [("view", "Great view from the balcony."),
+                           ("host", "Great host, great stay!"),
+                           ("noise", "Noisy street, no view at all"),
+                           ("none", None)]:
+            rv = Review(text=text) if text else Review()
+            self.fs.new(rv)
+            self.reviews[name] = rv
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def names(self, objects):
+        ids = {rv.id: name for name, rv in self.reviews.items()}
+        return [ids[obj.id] for obj in objects.values()]
+
+    def test_ranked_results(self):
+        self.assertEqual(["host", "view"],
+                         self.names(self.fs.search(Review, "GREAT")))
+        self.assertEqual(["view", "host", "noise"],
+                         self.names(self.fs.search(Review, "great view")))
+        self.assertEqual(["view"], self.names(
+            self.fs.search(Review, "great view", limit=1)))
+        self.assertEqual({}, self.fs.search(Review, "pool"))
+
+    def test_place_name_and_description(self):
+        pl = Place(name="Sunny loft", description="Close to the beach")
+        self.fs.new(pl)
+        self.assertEqual(["Place." + pl.id],
+                         list(self.fs.search(Place, "loft beach")))
+        self.assertEqual({}, self.fs.search("User", "loft"))
+
+    def test_index_follows_changes(self):
+        with patch("models.base_model.storage", self.fs):
+            self.reviews["none"].text = "A pool with a view"
+        self.fs.delete(self.reviews["noise"])
+        self.assertEqual(["none"], self.names(self.fs.search(Review,
+                                                             "pool")))
+        self.assertEqual({"view", "none"}, set(
+            self.names(self.fs.search(Review, "view"))))
+
+
+class TestFileStorage_threadsafe(unittest.TestCase):
+    """Unittests for testing FileStorage shared between threads."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.fs = FileStorage(self.path, threadsafe=True)
+        patcher = patch("models.base_model.storage", self.fs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_threads(self, *targets):
+        errors = []
+
+        def run(target):
+            try:
+                target()
+            except Exception as error:
+                errors.append(error)
+        threads = [threading.Thread(target=run, args=(target,))
+                   for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+
+    def test_stress(self):
+        done = threading.Event()
+
+        def write():
+            for i in range(30):
+                pl = Place()
+                self.fs.new(pl)
+                pl.price_by_night = i
+                pl.latitude = i / 10
+                if i % 3 == 0:
+                    self.fs.delete(pl)
+                self.fs.save()
+
+        def read():
+            while not done.is_set():
+                for obj in self.fs.all().values():
+                    str(obj)
+                self.fs.count(Place)
+                self.fs.query_range(Place, "price_by_night", 10, 50)
+                self.fs.near(Place, 1, 0, 100)
+                list(self.fs.iterate(Place))
+
+        writers = [write] * 4
+        readers = [read] * 4
+
+        def stop_readers():
+            self.run_threads(*writers)
+            done.set()
+        self.run_threads(stop_readers, *readers)
+        self.assertEqual(4 * 20, self.fs.count(Place))
+        fs = FileStorage(self.path)
+        self.assertEqual(4 * 20, len(fs.reload()))
+
+    def test_readers_do_not_wait_for_the_disk(self):
+        pl = Place()
+        self.fs.new(pl)
+        writing = threading.Event()
+        read = threading.Event()
+        waited = []
+        stage = snapshot.stage
+
+        def slow_stage(*args, **kwargs):
+            writing.set()
+            waited.append(read.wait(5))
+            return stage(*args, **kwargs)
+
+        def reader():
+            writing.wait(5)
+            self.assertIs(pl, self.fs.get(Place, pl.id))
+            pl.name = "Loft"
+            read.set()
+        with patch("models.engine.snapshot.stage", slow_stage):
+            self.run_threads(self.fs.save, reader)
+        self.assertEqual([True], waited)
+        fs = FileStorage(self.path)
+        fs.reload()
+        self.assertEqual("", fs.get(Place, pl.id).name)
+        self.fs.save()
+        fs.reload()
+        self.assertEqual("Loft", fs.get(Place, pl.id).name)
+
+    def test_all_returns_a_copy(self):
+        objects = self.fs.all()
+        self.fs.new(Place())
+        self.assertEqual({}, objects)
+
+
+class TestFileStorage_write_behind(unittest.TestCase):
+    """Unittests for testing the write-behind mode of FileStorage."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def saved(self):
+        fs = FileStorage(self.path)
+        return fs.reload()
+
+    def wait_saved(self, count):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if os.path.exists(self.path) and len(self.saved()) == count:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_save_is_left_to_the_thread(self):
+        fs = FileStorage(self.path, write_behind=0.05)
+        fs.new(Place())
+        with patch("models.engine.snapshot.stage") as stage:
+            fs.save()
+            stage.assert_not_called()
+        self.assertTrue(self.wait_saved(1))
+
+    def test_size_threshold_wakes_the_thread(self):
+        fs = FileStorage(self.path, write_behind=60, write_behind_size=3)
+        fs.new(Place())
+        fs.save()
+        fs.new(Place())
+        fs.new(Place())
+        fs.save()
+        self.assertTrue(self.wait_saved(3))
+
+    def test_flush(self):
+        fs = FileStorage(self.path, write_behind=60)
+        pl = Place()
+        fs.new(pl)
+        fs.save()
+        self.assertFalse(os.path.exists(self.path))
+        fs.flush()
+        self.assertEqual(["Place." + pl.id], list(self.saved()))
+
+    def test_background_error_is_raised(self):
+        fs = FileStorage(self.path, write_behind=0.01)
+        fs.new(Place())
+        with patch("models.engine.snapshot.stage",
+                   side_effect=OSError("disk full")):
+            with self.assertRaisesRegex(OSError, "disk full"):
+                deadline = time.monotonic() + 5
+                while time.monotonic() < deadline:
+                    fs.save()
+                    time.sleep(0.01)
+        fs.save()
+        self.assertTrue(self.wait_saved(1))
+        fs.close()
+
+    def test_close(self):
+        fs = FileStorage(self.path, write_behind=60)
+        fs.new(Place())
+        fs.save()
+        worker = [thread for thread in threading.enumerate()
+                  if thread.name == "FileStorage write-behind"][-1]
+        fs.new(Place())
+        fs.close()
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(2, len(self.saved()))
+
+
+def add_places(path, journal, count):
+    """Add count places to the store at path, saving after each one."""
+    fs = FileStorage(path, journal=journal, compact_threshold=10,
+                     multiprocess=True)
+    fs.reload()
+    for _ in range(count):
+        fs.new(Place.from_dict({}))
+        fs.save()
+
+
+class TestFileStorage_multiprocess(unittest.TestCase):
+    """Unittests for testing FileStorage shared between processes."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def open(self, **kwargs):
+        fs = FileStorage(self.path, multiprocess=True, **kwargs)
+        fs.reload()
+        return fs
+
+    def test_saves_do_not_clobber(self):
+        fs1 = self.open()
+        fs2 = self.open()
+        pl1 = Place()
+        fs1.new(pl1)
+        fs1.save()
+        pl2 = Place()
+        fs2.new(pl2)
+        fs2.save()
+        self.assertIsNotNone(fs2.get(Place, pl1.id))
+        self.assertEqual({"Place." + pl1.id, "Place." + pl2.id},
+                         set(self.open().all()))
+
+    def test_refresh_reads_new_journal_records(self):
+        fs1 = self.open(journal=True)
+        pl = Place(name="Loft")
+        fs1.new(pl)
+        fs1.save()
+        fs2 = self.open(journal=True)
+        held = fs2.get(Place, pl.id)
+        self.assertFalse(fs2.refresh())
+        with patch("models.base_model.storage", fs1):
+            pl.name = "Shed"
+        fs1.save()
+        with patch("models.engine.snapshot.read") as read:
+            self.assertTrue(fs2.refresh())
+            read.assert_not_called()
+        self.assertIs(held, fs2.get(Place, pl.id))
+        self.assertEqual("Shed", held.name)
+        fs1.delete(pl)
+        fs1.save()
+        fs2.refresh()
+        self.assertIsNone(fs2.get(Place, pl.id))
+
+    def test_refresh_after_rewrite(self):
+        for kwargs in ({}, {"lazy": True}, {"journal": True}):
+            with self.subTest(**kwargs):
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                fs1 = self.open(**kwargs)
+                kept = Place(name="Loft")
+                changed = Place(name="Loft")
+                gone = Place()
+                for pl in (kept, changed, gone):
+                    fs1.new(pl)
+                fs1.save()
+                fs2 = self.open(**kwargs)
+                held = fs2.get(Place, kept.id)
+                fs1.delete(gone)
+                with patch("models.base_model.storage", fs1):
+                    changed.name = "Shed"
+                fs1.new(Place())
+                fs1.save()
+                fs1.compact()
+                self.assertTrue(fs2.refresh())
+                self.assertEqual(3, fs2.count(Place))
+                self.assertIs(held, fs2.get(Place, kept.id))
+                self.assertEqual("Shed", fs2.get(Place, changed.id).name)
+                self.assertIsNone(fs2.get(Place, gone.id))
+
+    def test_unsaved_changes_win(self):
+        fs1 = self.open()
+        pl = Place(name="Loft")
+        fs1.new(pl)
+        fs1.save()
+        fs2 = self.open()
+        mine = fs2.get(Place, pl.id)
+        with patch("models.base_model.storage", fs2):
+            mine.name = "Mine"
+        with patch("models.base_model.storage", fs1):
+            pl.name = "Theirs"
+        fs1.save()
+        fs2.refresh()
+        self.assertEqual("Mine", mine.name)
+        fs2.save()
+        self.assertEqual("Mine", self.open().get(Place, pl.id).name)
+
+    def test_processes(self):
+        for journal in (False, True):
+            with self.subTest(journal=journal):
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                workers = [multiprocessing.Process(
+                    target=add_places, args=(self.path, journal, 25))
+                    for _ in range(4)]
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+                self.assertEqual([0] * 4,
+                                 [worker.exitcode for worker in workers])
+                self.assertEqual(100, self.open(journal=journal).count())
+
+
+class TestFileStorage_async(unittest.TestCase):
+    """Unittests for testing the asyncio methods of FileStorage."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.fs = FileStorage(self.path, threadsafe=True)
+        patcher = patch("models.base_model.storage", self.fs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.places = [Place(city_id=str(i % 2)) for i in range(5)]
+        for pl in self.places:
+            self.fs.new(pl)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_asave_coalesces(self):
+        async def main():
+            await asyncio.gather(*(self.fs.asave() for _ in range(20)))
+        with patch("models.engine.snapshot.dump",
+                   wraps=snapshot.dump) as dump:
+            asyncio.run(main())
+        self.assertLessEqual(dump.call_count, 2)
+        self.assertEqual(5, len(FileStorage(self.path).reload()))
+
+    def test_asave_after_change(self):
+        async def main():
+            await self.fs.asave()
+            pl = Place()
+            self.fs.new(pl)
+            await self.fs.asave()
+            return pl
+        pl = asyncio.run(main())
+        self.assertIn("Place." + pl.id, FileStorage(self.path).reload())
+
+    def test_aiter(self):
+        async def main():
+            return [obj async for obj in self.fs.aiter(Place, chunk=2)]
+        ids = sorted(pl.id for pl in self.places)
+        self.assertEqual(ids, [obj.id for obj in asyncio.run(main())])
+
+    def test_aget_and_aquery(self):
+        async def main():
+            return (await self.fs.aget(Place, self.places[0].id),
+                    await self.fs.aquery(Place, city_id="1"),
+                    await self.fs.acount(Place))
+        obj, found, count = asyncio.run(main())
+        self.assertIs(self.places[0], obj)
+        self.assertEqual({"Place." + self.places[1].id,
+                          "Place." + self.places[3].id}, set(found))
+        self.assertEqual(5, count)
+
+    def test_needs_threadsafe(self):
+        fs = FileStorage(self.path)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(fs.acount())
+
+
+if __name__ == "__main__":
+    unittest.main()